@@ -1,16 +1,20 @@
 # lumo_expressive.py
 #
 # NAO controller reacts based on your physical webcam and recognized emotion.
+# Expressive behavior profile: full-body gestures with LED colour and speech.
+# The pipeline itself (webcam, emotion model, smoothing, speech, main loop) is
+# lumo.core.
 
-
-
-from controller import Robot, Motor, LED
-import numpy as np
-import cv2
-from deepface import DeepFace
-import pyttsx3
-import sys
+import os
 import random
+import sys
+
+# Shared lumo package lives at the repository root (two levels up).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lumo.core import BehaviorProfile, Lumo, LumoConfig, controller_arg
+from lumo.leds import emotion_colors, emotion_patterns
+from lumo.gestures import load_library
+from lumo.motion import pose
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 1. CONFIGURABLE PARAMETERS
@@ -21,91 +25,128 @@ WEBCAM_ID    = 0    # Index of your physical USB/webcam
 DISPLAY_W    = 320  # Window width (pixels)
 DISPLAY_H    = 240  # Window height (pixels)
 
-# LED colors for each emotion (hex)
-LED_COLORS = {
-    "happy":      0x00FF00,  # green
-    "sad":        0x0000FF,  # blue
-    "angry":      0x9DD8E6,  # light blue
-    "frightened": 0xFFFF00,  # yellow
-    "surprise":   0xFF00FF,  # magenta
+# The preview window is drawn on its own thread, at most PREVIEW_FPS times per
+# second (face boxes, emotion bars, stage timings). HEADLESS = True opens no
+# window at all (production runs); ESC then cannot stop the controller.
+PREVIEW_FPS = 10.0
+HEADLESS    = False
+
+# Emotion model: "deepface" (Keras/TensorFlow) or "onnx" (FER+ via ONNX Runtime
+# or cv2.dnn; put emotion-ferplus-8.onnx in models/ at the repository root)
+EMOTION_BACKEND = "deepface"
+
+# With several people in view, all faces are classified in one batch and Lumo
+# reacts to one of them: "largest", "center" (closest to the image centre) or
+# "confident" (the most certain emotion estimate)
+TARGET_POLICY = "largest"
+
+# Skip the emotion model for a face that has barely changed since it was last
+# classified (mean absolute difference of a 16x16 grayscale thumbnail, 0..255)
+# and reuse its previous result, at most SKIP_MAX_STALE frames in a row;
+# SKIP_THRESHOLD = None classifies every frame
+SKIP_THRESHOLD = 4.0
+SKIP_MAX_STALE = 10
+
+# Emotion cache: faces that look like one classified in the last CACHE_TTL
+# seconds (signatures within CACHE_MAX_DISTANCE of 256 bits) reuse its result
+# instead of running the model; at most CACHE_SIZE entries (0 disables)
+CACHE_SIZE         = 256
+CACHE_TTL          = 30.0
+CACHE_MAX_DISTANCE = 8
+
+# Load the emotion backend's model in the background while the webcam and
+# robot start up (False: load it just before the loop)
+PARALLEL_MODEL_LOAD = True
+
+# Run emotion inference in this many worker processes (frames are handed over
+# through shared memory; throughput scales with CPU cores). 0 keeps a single
+# inference thread inside the controller process.
+INFERENCE_WORKERS = 0
+
+# Several robots in one world: set PERCEPTION to the "host:port" of a
+# perception host (controllers/lumo_perception) and this controller opens no
+# webcam and loads no model; it reacts to the host's emotion results instead.
+# A Webots controllerArgs entry "--perception=host:port" overrides it per robot.
+PERCEPTION = None
+
+# Synthetic emotion driver for testing the reactions without a webcam or a
+# model: "random", "random:COUNT[:SEED]" or a file of "time emotion" lines,
+# played in simulation time straight into dispatch (no smoothing, no cooldown,
+# speech only logged). Meant for webots --mode=fast --no-rendering, see
+# worlds/ain457_synthetic.wbt; controllerArgs "--synthetic=..." overrides it.
+SYNTHETIC = None
+
+SPEECH_RATE   = 150  # [words per minute]
+# Every reaction line is rendered to WAV here once and replayed from disk;
+# set to None to always synthesize live (needs simpleaudio, or winsound on Windows)
+TTS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+
+# Emotion smoothing: average of the last N results, enter/exit thresholds on
+# the averaged probability, and minimum seconds between two identical reactions
+EMOTION_WINDOW   = 5
+EMOTION_ENTER    = 0.55
+EMOTION_EXIT     = 0.35
+EMOTION_COOLDOWN = 10.0
+
+# Loop instrumentation: per-stage timings, loop rate and sim/wall drift are
+# summarised every PERF_SUMMARY_EVERY seconds (None: only on exit); set
+# PERF_DUMP to a .csv or .jsonl path to also log every iteration
+PERF_SUMMARY_EVERY = 10.0
+PERF_DUMP          = None
+
+# Event log: runtime messages ([TTS], [LED], [ACTION], ...) go through a
+# background writer instead of print(). LOG_LEVEL filters the console
+# ("DEBUG", "INFO", "WARN", "ERROR"); EVENT_LOG is a .jsonl path that gets
+# every record plus one per analysed frame (frame id, sim time, emotion
+# vector, chosen action). DEBUG_EVERY = N keeps every N-th debug record
+# (0: debug off, free on the hot path)
+EVENT_LOG   = None
+LOG_LEVEL   = "INFO"
+DEBUG_EVERY = 0
+
+# Session recording: with RECORD_DIR set, every run writes a new session
+# directory there with the analysed frames (every RECORD_FRAME_EVERY-th,
+# scaled by RECORD_FRAME_SCALE, JPEG at RECORD_JPEG_QUALITY or raw if None),
+# the per-frame emotion vectors and every motor/LED command sent.
+# Summarise one with: python -m lumo.recording <session directory>
+RECORD_DIR          = None
+RECORD_FRAME_EVERY  = 1
+RECORD_FRAME_SCALE  = 0.5
+RECORD_JPEG_QUALITY = 80
+
+# Gesture library: keyframes over joint names, compiled at startup into
+# per-step joint target arrays, and which gestures each reaction plays (edit
+# or extend it without touching this file)
+GESTURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gestures.json")
+
+# LED colour (hex) and animation per emotion. The defaults are
+# lumo.leds.EMOTION_COLORS and EMOTION_PATTERNS; list only what to change.
+# An animation is a pattern ("solid", "pulse", "breathe", "fade_in",
+# "fade_out") and its period [ms] per LED group (face, chest, feet); groups
+# not listed keep their default. Tables are precomputed at startup and
+# advance one entry per TIME_STEP. E.g.
+#   LED_COLORS   = {"angry": 0xFF0000}
+#   LED_PATTERNS = {"sad": {"feet": ("solid", 0)}}
+LED_COLORS = {}
+LED_PATTERNS = {}
+
+# Reaction priorities: a new reaction interrupts the playing one unless that
+# one has a higher priority (interrupted motion blends back to the rest pose)
+REACTION_PRIORITY = {
+    "happy":      1,
+    "sad":        1,
+    "surprise":   2,
+    "angry":      2,
+    "frightened": 3,
 }
+# Cancel the playing reaction once no face was seen for this many seconds
+# (None: always let it finish)
+USER_LOST_AFTER = 2.0
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 2. SET UP PC WEBCAM
+# 2. LINES FOR REACTIONS
 # ─────────────────────────────────────────────────────────────────────────────
 
-cap = cv2.VideoCapture(WEBCAM_ID)
-if not cap.isOpened():
-    print(f"[ERROR] Cannot open webcam at index {WEBCAM_ID}")
-    sys.exit(1)
-print(f"[INFO] Webcam (ID={WEBCAM_ID}) opened successfully.")
-
-# Lower capture resolution to reduce DeepFace load:
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, DISPLAY_W)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, DISPLAY_H)
-cv2.namedWindow("Webcam Feed", cv2.WINDOW_AUTOSIZE)
-cv2.moveWindow("Webcam Feed", 0, 0)
-
-# ─────────────────────────────────────────────────────────────────────────────
-# 3. INITIALIZE THE ROBOT
-# ─────────────────────────────────────────────────────────────────────────────
-
-robot = Robot()
-print("[INFO] Webots Robot node initialized.")
-
-# ─────────────────────────────────────────────────────────────────────────────
-# 4. DEVICE SETUP: MOTORS + LEDs + Lines
-# ─────────────────────────────────────────────────────────────────────────────
-
-# 4.1. Head joints
-head_yaw:   Motor = robot.getDevice("HeadYaw")
-head_pitch: Motor = robot.getDevice("HeadPitch")
-
-# 4.2. Shoulder joints
-l_shoulder_pitch: Motor = robot.getDevice("LShoulderPitch")
-l_shoulder_roll:  Motor = robot.getDevice("LShoulderRoll")
-r_shoulder_pitch: Motor = robot.getDevice("RShoulderPitch")
-r_shoulder_roll:  Motor = robot.getDevice("RShoulderRoll")
-
-# 4.3. Elbow joints
-r_elbow_yaw: Motor = robot.getDevice("RElbowYaw")
-l_elbow_yaw: Motor = robot.getDevice("LElbowYaw")
-r_elbow_roll: Motor = robot.getDevice("RElbowRoll")
-l_elbow_roll: Motor = robot.getDevice("LElbowRoll")
-
-# 4.4 Wrist joints
-r_wrist_yaw: Motor = robot.getDevice("RWristYaw")
-l_wrist_yaw: Motor = robot.getDevice("LWristYaw")
-
-# 4.5. LEDs
-face_left_led:  LED = robot.getDevice("Face/Led/Left")
-face_right_led: LED = robot.getDevice("Face/Led/Right")
-chest_led:      LED = robot.getDevice("ChestBoard/Led")
-lfoot_led:      LED = robot.getDevice("LFoot/Led")
-rfoot_led:      LED = robot.getDevice("RFoot/Led")
-
-ALL_LEDS = [
-    face_left_led, face_right_led,
-    chest_led,
-    lfoot_led, rfoot_led
-]
-
-# 4.6. Initialize all joints to neutral positions
-# Head neutral
-head_yaw.setPosition(0.0);   head_yaw.setVelocity(0.0)
-head_pitch.setPosition(0.0); head_pitch.setVelocity(0.0)
-
-# Arms down (shoulderPitch = +1.0 rad places arms alongside body)
-l_shoulder_pitch.setPosition(1.0); l_shoulder_pitch.setVelocity(0.0)
-l_shoulder_roll.setPosition(0.0);   l_shoulder_roll.setVelocity(0.0)
-r_shoulder_pitch.setPosition(1.0); r_shoulder_pitch.setVelocity(0.0)
-r_shoulder_roll.setPosition(0.0);  r_shoulder_roll.setVelocity(0.0)
-
-# 4.7. Turn all LEDs off initially
-for led in ALL_LEDS:
-    led.set(0x000000)  # LED.set(rgb) uses 0xRRGGBB
-
-# 4.8 Lines for reactions
 happy_lines = [
     "You look so cheerful today!",
     "That smile suits you!",
@@ -152,402 +193,99 @@ surprised_lines = [
 ]
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 5. INITIALIZE PYTTSX3 FOR SPEECH (PC speaker)
+# 3. BEHAVIOR PROFILE (motion + LED color + speech)
 # ─────────────────────────────────────────────────────────────────────────────
 
-tts_engine = pyttsx3.init()
-tts_engine.setProperty("rate", 150)  # words per minute
-print("[INFO] pyttsx3 TTS engine initialized.")
+# Neutral posture while idle: head centred, arms alongside the body
+# (shoulderPitch = +1.0 rad). Velocity None keeps each joint's current
+# velocity, so a joint still returning to rest after an interrupted gesture
+# finishes the move instead of freezing (a velocity of 0.0 would stop it).
+NEUTRAL_POSE = pose(None,
+                    HeadYaw=0.0, HeadPitch=0.0,
+                    LShoulderPitch=1.0, LShoulderRoll=0.0,
+                    RShoulderPitch=1.0, RShoulderRoll=0.0)
 
-def speak(text: str):
-    """Speak via PC speaker (pyttsx3)."""
-    print(f"[TTS] {text}")
-    tts_engine.say(text)
-    tts_engine.runAndWait()
-
-# ─────────────────────────────────────────────────────────────────────────────
-# 6. HELPER: GRAB A FRAME FROM WEBCAM
-# ─────────────────────────────────────────────────────────────────────────────
-
-def get_webcam_frame():
-    """
-    Capture one frame from the PC webcam and return it as a BGR image.
-    Returns None if frame read fails.
-    """
-    ret, frame = cap.read()
-    if not ret:
-        return None
-    return cv2.resize(frame, (DISPLAY_W, DISPLAY_H))
-
-# ─────────────────────────────────────────────────────────────────────────────
-# 7. UTILITY: RESET ALL LEDs TO “OFF”
-# ─────────────────────────────────────────────────────────────────────────────
-
-def leds_off():
-    """Turn every LED in ALL_LEDS to black (off)."""
-    for led in ALL_LEDS:
-        led.set(0x000000)
-
-# Hand controls
-phalange_names = [
-    "RPhalanx1", "RPhalanx2", "RPhalanx3", "RPhalanx4", "RPhalanx5", "RPhalanx6", "RPhalanx7", "RPhalanx8",
-    "LPhalanx1", "LPhalanx2", "LPhalanx3", "LPhalanx4", "LPhalanx5", "LPhalanx6", "LPhalanx7", "LPhalanx8"
-]
-
-phalanges = [robot.getDevice(name) for name in phalange_names]
-for m in phalanges:
-    m.setVelocity(4.0)
-
-def set_hands(open: bool):
+class ExpressiveProfile(BehaviorProfile):
     """
-    Open or close all phalanx joints.
-      open=True  → set to 1.0 (fully open)
-      open=False → set to 0.0 (fully closed)
+    Full-body gestures for each reaction, played alongside the LED and
+    speech tracks. The gestures live in GESTURE_FILE and are compiled once
+    at startup; their actions ("say:N") and wait conditions ("speaking") are
+    bound here each time one is played, and checked against every line
+    table entry in setup().
     """
-    target = 1.0 if open else 0.0
-    for m in phalanges:
-        m.setPosition(target)
-    # wait for the motion to complete
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-
-# ─────────────────────────────────────────────────────────────────────────────
-# 8. EMOTION‐BASED SEQUENCES (motion + LED color + speech)
-# ─────────────────────────────────────────────────────────────────────────────
-
-def do_happy_sequence():
-    
-    print("[LED] HAPPY: setting LEDs → GREEN")
-    for led in ALL_LEDS:
-        led.set(LED_COLORS["happy"])
-
-    speak(random.choice(happy_lines))
-
-    
-    set_hands(True)
-    l_shoulder_pitch.setPosition(-1.0); l_shoulder_pitch.setVelocity(1.5)
-    r_shoulder_pitch.setPosition(-1.0); r_shoulder_pitch.setVelocity(1.5)
-    for _ in range(int(1500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    for i in range(2):
-        l_shoulder_roll.setPosition( 0.5); l_shoulder_roll.setVelocity(1.0)
-        r_shoulder_roll.setPosition( 0.5); r_shoulder_roll.setVelocity(1.0)
-        for _ in range(int(500 / TIME_STEP)):
-            robot.step(TIME_STEP)
-
-        l_shoulder_roll.setPosition(-0.5); l_shoulder_roll.setVelocity(1.0)
-        r_shoulder_roll.setPosition(-0.5); r_shoulder_roll.setVelocity(1.0)
-        for _ in range(int(500 / TIME_STEP)):
-            robot.step(TIME_STEP)
-
-    set_hands(False)
-
-    l_shoulder_roll.setPosition(0.0); l_shoulder_roll.setVelocity(1.0)
-    r_shoulder_roll.setPosition(0.0); r_shoulder_roll.setVelocity(1.0)
-    for _ in range(int(400 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    l_shoulder_pitch.setPosition(1.0); l_shoulder_pitch.setVelocity(1.5)
-    r_shoulder_pitch.setPosition(1.0); r_shoulder_pitch.setVelocity(1.5)
-    
-    for _ in range(int(1700 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    print("[LED] HAPPY: turning LEDs OFF")
-    leds_off()
-
-def do_sad_sequence():
-
-    print("[LED] SAD: setting LEDs → BLUE")
-    for led in ALL_LEDS:
-        led.set(LED_COLORS["sad"])
-
-    sad_line1, sad_line2 = random.choice(sad_lines)
-    speak(sad_line1)
-
-    head_pitch.setPosition(0.5); head_pitch.setVelocity(1.0)
-    for _ in range(int(1500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    head_pitch.setPosition(0.0); head_pitch.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    set_hands(True)
-    l_elbow_yaw.setPosition(-2.0); l_elbow_yaw.setVelocity(2.2)
-    r_elbow_yaw.setPosition(2.0); r_elbow_yaw.setVelocity(2.2)
-    for _ in range(int(1000 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    l_shoulder_pitch.setPosition(0.6); l_shoulder_pitch.setVelocity(1.5)
-    r_shoulder_pitch.setPosition(0.6); r_shoulder_pitch.setVelocity(1.5)
-    l_shoulder_roll.setPosition(0.3); l_shoulder_roll.setVelocity(1.5)
-    r_shoulder_roll.setPosition(-0.3); r_shoulder_roll.setVelocity(1.5)
-    for _ in range(int(1000 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    l_elbow_roll.setPosition(-0.4); l_elbow_roll.setVelocity(2.0)
-    r_elbow_roll.setPosition(0.4); r_elbow_roll.setVelocity(2.0)
-    for _ in range(int(1000 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    speak(sad_line2)
-
-    set_hands(False)
-    l_elbow_yaw.setPosition(0.0); l_elbow_yaw.setVelocity(2.2)
-    r_elbow_yaw.setPosition(0.0); r_elbow_yaw.setVelocity(2.2)
-    for _ in range(int(1000 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    l_shoulder_pitch.setPosition(1.0); l_shoulder_pitch.setVelocity(1.5)
-    r_shoulder_pitch.setPosition(1.0); r_shoulder_pitch.setVelocity(1.5)
-    l_shoulder_roll.setPosition(0.0); l_shoulder_roll.setVelocity(1.5)
-    r_shoulder_roll.setPosition(0.0); r_shoulder_roll.setVelocity(1.5)
-    for _ in range(int(1000 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    l_elbow_roll.setPosition(0.0); l_elbow_roll.setVelocity(2.0)
-    r_elbow_roll.setPosition(0.0); r_elbow_roll.setVelocity(2.0)
-    for _ in range(int(1000 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    print("[LED] SAD: turning LEDs OFF")
-    leds_off()
-
-def do_angry_sequence():
-
-    print("[LED] ANGRY: setting LEDs → RED")
-    for led in ALL_LEDS:
-        led.set(LED_COLORS["angry"])
-
-    speak(random.choice(angry_lines))
-    
-    l_shoulder_pitch.setPosition(0.1); l_shoulder_pitch.setVelocity(1.0)
-    r_shoulder_pitch.setPosition(0.1); r_shoulder_pitch.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    set_hands(True)
-
-    l_elbow_yaw.setPosition(-1.0); l_elbow_yaw.setVelocity(1.0)
-    l_wrist_yaw.setPosition(1.0); l_wrist_yaw.setVelocity(1.0)
-    r_elbow_yaw.setPosition(1.0); r_elbow_yaw.setVelocity(1.0)
-    r_wrist_yaw.setPosition(-1.0); r_wrist_yaw.setVelocity(1.0)
-    for _ in range(int(1000 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    l_elbow_roll.setPosition(-0.2); l_elbow_roll.setVelocity(1.0)
-    l_shoulder_roll.setPosition(0.2); l_shoulder_roll.setVelocity(1.0)
-    r_elbow_roll.setPosition(0.2); r_elbow_roll.setVelocity(1.0)
-    r_shoulder_roll.setPosition(-0.2); r_shoulder_roll.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    l_elbow_roll.setPosition(0.0); l_elbow_roll.setVelocity(1.0)
-    l_shoulder_roll.setPosition(0.0); l_shoulder_roll.setVelocity(1.0)
-    r_elbow_roll.setPosition(0.0); r_elbow_roll.setVelocity(1.0)
-    r_shoulder_roll.setPosition(0.0); r_shoulder_roll.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    l_elbow_roll.setPosition(-0.2); l_elbow_roll.setVelocity(1.0)
-    l_shoulder_roll.setPosition(0.2); l_shoulder_roll.setVelocity(1.0)
-    r_elbow_roll.setPosition(0.2); r_elbow_roll.setVelocity(1.0)
-    r_shoulder_roll.setPosition(-0.2); r_shoulder_roll.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    l_elbow_roll.setPosition(0.0); l_elbow_roll.setVelocity(1.0)
-    l_shoulder_roll.setPosition(0.0); l_shoulder_roll.setVelocity(1.0)
-    r_elbow_roll.setPosition(0.0); r_elbow_roll.setVelocity(1.0)
-    r_shoulder_roll.setPosition(0.0); r_shoulder_roll.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-    
-    l_shoulder_pitch.setPosition(1.0); l_shoulder_pitch.setVelocity(1.0)
-    r_shoulder_pitch.setPosition(1.0); r_shoulder_pitch.setVelocity(1.0)
-    l_elbow_yaw.setPosition(0.0); l_elbow_yaw.setVelocity(1.0)
-    l_wrist_yaw.setPosition(0.0); l_wrist_yaw.setVelocity(1.0)
-    r_elbow_yaw.setPosition(0.0); r_elbow_yaw.setVelocity(1.0)
-    r_wrist_yaw.setPosition(0.0); r_wrist_yaw.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    set_hands(False)
-
-    print("[LED] ANGRY: turning LEDs OFF")
-    leds_off()
-
-def do_frightened_sequence():
-
-    print("[LED] FRIGHTENED: setting LEDs → YELLOW")
-    for led in ALL_LEDS:
-        led.set(LED_COLORS["frightened"])
-
-    frightened_line1, frightened_line2 = random.choice(frightened_lines)
-    speak(frightened_line1)
-
-    for i in range(2):
-        head_yaw.setPosition( 0.7); head_yaw.setVelocity(1.0)
-        for _ in range(int(1000 / TIME_STEP)):
-            robot.step(TIME_STEP)
-
-        head_yaw.setPosition(-0.7); head_yaw.setVelocity(1.0)
-        for _ in range(int(1000 / TIME_STEP)):
-            robot.step(TIME_STEP)
-
-    head_yaw.setPosition(0.0); head_yaw.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    speak(frightened_line2)
-
-    print("[LED] FRIGHTENED: turning LEDs OFF")
-    leds_off()
-
-def do_surprised_sequence():
-
-    print("[LED] SURPRISED: setting LEDs → MAGENTA")
-    for led in ALL_LEDS:
-        led.set(LED_COLORS["surprise"])
-
-    surprised_line1, surprised_line2 = random.choice(surprised_lines)
-    speak(surprised_line1)
-
-    r_wrist_yaw.setPosition(1.0); r_wrist_yaw.setVelocity(1.0)
-    l_shoulder_pitch.setPosition(0.4); l_shoulder_pitch.setVelocity(1.0)
-    l_elbow_yaw.setPosition(-0.5); l_elbow_yaw.setVelocity(1.0)
-    l_wrist_yaw.setPosition(-0.5); l_wrist_yaw.setVelocity(1.0)
-    for _ in range(int(1000 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    set_hands(True)
-
-    r_shoulder_roll.setPosition(-0.3); r_shoulder_roll.setVelocity(1.0)
-    r_elbow_roll.setPosition(0.6); r_elbow_roll.setVelocity(1.0)
-    l_elbow_roll.setPosition(-1.0); l_elbow_roll.setVelocity(1.0)
-    for _ in range(int(1500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-
-    speak(surprised_line2)
-
-    l_shoulder_pitch.setPosition(1.0); l_shoulder_pitch.setVelocity(1.0)
-    r_shoulder_roll.setPosition(0.0); r_shoulder_roll.setVelocity(1.0)
-    l_elbow_roll.setPosition(0.0); l_elbow_roll.setVelocity(1.0)
-    r_elbow_roll.setPosition(0.0); r_elbow_roll.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-        
-
-    l_wrist_yaw.setPosition(0.0); l_wrist_yaw.setVelocity(1.0)
-    r_wrist_yaw.setPosition(0.0); r_wrist_yaw.setVelocity(1.0)
-    l_elbow_yaw.setPosition(0.0); l_elbow_yaw.setVelocity(1.0)
-    for _ in range(int(500 / TIME_STEP)):
-        robot.step(TIME_STEP)
-    
-    print("[LED] SURPRISED: turning LEDs OFF")
-    leds_off()
-
-# ─────────────────────────────────────────────────────────────────────────────
-# 9. MAIN CONTROL LOOP
-# ─────────────────────────────────────────────────────────────────────────────
 
-print("[INFO] Entering main control loop. Press ESC in the 'Webcam Feed' window to exit.")
-while robot.step(TIME_STEP) != -1:
-    # 9.1. Grab one frame from the webcam
-    frame = get_webcam_frame()
-    if frame is None:
-        print("[WARN] Frame read failed. Keeping joints & LEDs neutral.")
-        # Reset everything to neutral
-        head_yaw.setPosition(0.0); head_yaw.setVelocity(0.0)
-        head_pitch.setPosition(0.0); head_pitch.setVelocity(0.0)
-        l_shoulder_pitch.setPosition(1.0); l_shoulder_pitch.setVelocity(0.0)
-        l_shoulder_roll.setPosition(0.0);   l_shoulder_roll.setVelocity(0.0)
-        r_shoulder_pitch.setPosition(1.0); r_shoulder_pitch.setVelocity(0.0)
-        r_shoulder_roll.setPosition(0.0);  r_shoulder_roll.setVelocity(0.0)
-        leds_off()
-        continue
-
-    print("[DEBUG] Frame acquired from webcam.")
-
-    # 9.2. Display raw frame & check for ESC key
-    cv2.imshow("Webcam Feed", frame)
-    key = cv2.waitKey(1) & 0xFF
-    if key == 27:  # ESC
-        print("[INFO] ESC pressed. Exiting controller.")
-        break
-
-    # 9.3. Run DeepFace only every full loop (block until sequence completes)
-    dominant_emotion = None
-    try:
-        small = cv2.resize(frame, (160, 120))
-        analytics = DeepFace.analyze(small, actions=["emotion"], enforce_detection=False)
-        print(f"[DEBUG] Raw DeepFace output: {analytics}")
-        if isinstance(analytics, list) and len(analytics) > 0:
-            analytics = analytics[0]
-        if isinstance(analytics, dict) and "dominant_emotion" in analytics:
-            dominant_emotion = analytics["dominant_emotion"]
-            print(f"[DEBUG] Extracted dominant_emotion: {dominant_emotion}")
-        else:
-            print("[WARN] DeepFace output missing 'dominant_emotion'.")
-    except Exception as e:
-        print(f"[WARN] DeepFace analysis error: {e}. No emotion detected.")
-
-    # 9.4. Overlay detected emotion on the frame
-    annotated = frame.copy()
-    if dominant_emotion:
-        cv2.putText(annotated,
-                    f"Emotion: {dominant_emotion}",
-                    (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.8,
-                    (0, 255, 0),
-                    2)
-    cv2.imshow("Webcam Feed", annotated)
-
-    # 9.5. Execute the full sequence for the detected emotion
-    if dominant_emotion == "happy":
-        print("[ACTION] Detected: HAPPY")
-        do_happy_sequence()
-
-    elif dominant_emotion == "sad":
-        print("[ACTION] Detected: SAD")
-        do_sad_sequence()
-
-    elif dominant_emotion == "angry":
-        print("[ACTION] Detected: ANGRY")
-        do_angry_sequence()
-
-    elif dominant_emotion in ["fear", "fearful", "frightened"]:
-        print("[ACTION] Detected: FRIGHTENED")
-        do_frightened_sequence()
-
-    elif dominant_emotion == "surprise":
-        print("[ACTION] Detected: SURPRISED")
-        do_surprised_sequence()
-
-    else:
-        # No face or unhandled emotion ⇒ keep everything neutral
-        if dominant_emotion is None:
-            print("[INFO] No emotion detected this frame.")
-        else:
-            print(f"[INFO] Emotion '{dominant_emotion}' not handled; resetting posture & LEDs.")
-        head_yaw.setPosition(0.0); head_yaw.setVelocity(0.0)
-        head_pitch.setPosition(0.0); head_pitch.setVelocity(0.0)
-        l_shoulder_pitch.setPosition(1.0); l_shoulder_pitch.setVelocity(0.0)
-        l_shoulder_roll.setPosition(0.0);   l_shoulder_roll.setVelocity(0.0)
-        r_shoulder_pitch.setPosition(1.0); r_shoulder_pitch.setVelocity(0.0)
-        r_shoulder_roll.setPosition(0.0);  r_shoulder_roll.setVelocity(0.0)
-        leds_off()
-        for _ in range(int(500 / TIME_STEP)):
-            robot.step(TIME_STEP)
+    name = "expressive"
+    lines = {
+        "happy":      happy_lines,
+        "sad":        sad_lines,
+        "angry":      angry_lines,
+        "frightened": frightened_lines,
+        "surprise":   surprised_lines,
+    }
+
+    def setup(self, lumo):
+        super().setup(lumo)
+        self.library = load_library(GESTURE_FILE, lumo.config.time_step)
+        self.joints = {name: lumo.device(name) for name in self.library.joints}
+        self.rest_pose = self.library.rest_pose
+        for name in self.library.groups.get("hands", []):
+            self.joints[name].setVelocity(4.0)
+        # Bind every reachable gesture against every line entry it can get, so a bad
+        # action or say:N index stops start-up rather than a reaction mid-way
+        for reaction, table in self.lines.items():
+            for gesture in self.library.reactions.get(reaction, ()):
+                for entry in table:
+                    self.library[gesture].bind(self._resolver(gesture, (entry,) if isinstance(entry, str) else entry))
+        self.neutral()
+
+    def neutral(self):
+        for name, (position, velocity) in NEUTRAL_POSE.items():
+            self.joints[name].setPosition(position)
+            if velocity is not None:
+                self.joints[name].setVelocity(velocity)
+
+    def gesture(self, reaction: str, lines):
+        names = self.library.reactions.get(reaction)
+        if not names:
+            return super().gesture(reaction, lines)
+        name = random.choice(names)
+        return self.library[name].bind(self._resolver(name, lines))
+
+    def _resolver(self, gesture: str, lines):
+        def resolve(name: str):
+            if name == "speaking":
+                return self.speaking
+            if name.startswith("say:"):
+                index = name[len("say:"):]
+                if not index.isdigit() or int(index) >= len(lines):
+                    raise ValueError(f"Gesture '{gesture}' in {GESTURE_FILE}: '{name}' needs a line index "
+                                     f"from 0 to {len(lines) - 1}")
+                return self.say(lines[int(index)])
+            raise ValueError(f"Unknown action '{name}' in gesture '{gesture}' of {GESTURE_FILE}")
+        return resolve
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 10. CLEAN UP (on exit)
+# 4. RUN
 # ─────────────────────────────────────────────────────────────────────────────
 
-print("[INFO] Cleaning up: releasing webcam and closing windows.")
-cap.release()
-cv2.destroyAllWindows()
+# Spawned inference workers (INFERENCE_WORKERS) re-import this script; only
+# the main process runs the controller.
+if __name__ == "__main__":
+    Lumo(LumoConfig(time_step=TIME_STEP, webcam_id=WEBCAM_ID, display_w=DISPLAY_W, display_h=DISPLAY_H,
+                    preview_fps=PREVIEW_FPS, headless=HEADLESS,
+                    emotion_backend=EMOTION_BACKEND, target_policy=TARGET_POLICY,
+                    skip_threshold=SKIP_THRESHOLD, skip_max_stale=SKIP_MAX_STALE,
+                    cache_size=CACHE_SIZE, cache_ttl=CACHE_TTL, cache_max_distance=CACHE_MAX_DISTANCE,
+                    parallel_model_load=PARALLEL_MODEL_LOAD, inference_workers=INFERENCE_WORKERS,
+                    perception=controller_arg("perception", PERCEPTION),
+                    synthetic=controller_arg("synthetic", SYNTHETIC),
+                    speech_rate=SPEECH_RATE, tts_cache_dir=TTS_CACHE_DIR,
+                    emotion_window=EMOTION_WINDOW, emotion_enter=EMOTION_ENTER,
+                    emotion_exit=EMOTION_EXIT, emotion_cooldown=EMOTION_COOLDOWN,
+                    perf_summary_every=PERF_SUMMARY_EVERY, perf_dump=PERF_DUMP,
+                    event_log=EVENT_LOG, log_level=LOG_LEVEL, debug_every=DEBUG_EVERY,
+                    record_dir=RECORD_DIR, record_frame_every=RECORD_FRAME_EVERY,
+                    record_frame_scale=RECORD_FRAME_SCALE, record_jpeg_quality=RECORD_JPEG_QUALITY,
+                    led_colors=emotion_colors(LED_COLORS), led_patterns=emotion_patterns(LED_PATTERNS),
+                    reaction_priority=REACTION_PRIORITY, user_lost_after=USER_LOST_AFTER),
+         ExpressiveProfile()).run()
@@ -0,0 +1,70 @@
+# lumo_perception.py
+#
+# Perception host for a room of Lumo robots. Owns the physical webcam, the
+# emotion model and the preview window, and broadcasts every emotion result
+# to the robot controllers that connect to LISTEN (see lumo.perception).
+# Robots opt in with PERCEPTION / controllerArgs "--perception=host:port".
+#
+# In worlds/ain457_room.wbt it runs on a body-less Robot node with
+# synchronization FALSE, so it never holds the simulation back. It can also be
+# started by hand outside Webots: python controllers/lumo_perception/lumo_perception.py
+
+import os
+import sys
+
+# Shared lumo package lives at the repository root (two levels up).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lumo.core import LumoConfig
+from lumo.perception import DEFAULT_ADDRESS, PerceptionServer
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 1. CONFIGURABLE PARAMETERS
+# ─────────────────────────────────────────────────────────────────────────────
+
+TIME_STEP    = 32   # [ms] how often new results are checked for and sent
+WEBCAM_ID    = 0    # Index of your physical USB/webcam
+DISPLAY_W    = 320  # Window width (pixels)
+DISPLAY_H    = 240  # Window height (pixels)
+
+# Address the robots connect to (local TCP)
+LISTEN = DEFAULT_ADDRESS
+
+# Preview window (see the robot controllers); ESC stops the host
+PREVIEW_FPS = 10.0
+HEADLESS    = False
+
+# Emotion model, target face and inference settings, as in the robot controllers
+EMOTION_BACKEND    = "deepface"
+TARGET_POLICY      = "largest"
+SKIP_THRESHOLD     = 4.0
+SKIP_MAX_STALE     = 10
+CACHE_SIZE         = 256
+CACHE_TTL          = 30.0
+CACHE_MAX_DISTANCE = 8
+INFERENCE_WORKERS  = 0
+
+# Event log (see the robot controllers)
+EVENT_LOG   = None
+LOG_LEVEL   = "INFO"
+DEBUG_EVERY = 0
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 2. RUN
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Spawned inference workers (INFERENCE_WORKERS) re-import this script; only
+# the main process runs the host.
+if __name__ == "__main__":
+    try:
+        from controller import Robot   # Webots
+    except ImportError:
+        Robot = None                   # started by hand: pace with time.sleep instead of robot.step
+    robot = Robot() if Robot is not None else None
+    PerceptionServer(LumoConfig(time_step=TIME_STEP, webcam_id=WEBCAM_ID, display_w=DISPLAY_W,
+                                display_h=DISPLAY_H, preview_fps=PREVIEW_FPS, headless=HEADLESS,
+                                emotion_backend=EMOTION_BACKEND, target_policy=TARGET_POLICY,
+                                skip_threshold=SKIP_THRESHOLD, skip_max_stale=SKIP_MAX_STALE,
+                                cache_size=CACHE_SIZE, cache_ttl=CACHE_TTL,
+                                cache_max_distance=CACHE_MAX_DISTANCE, inference_workers=INFERENCE_WORKERS,
+                                event_log=EVENT_LOG, log_level=LOG_LEVEL, debug_every=DEBUG_EVERY),
+                     address=LISTEN).run(step=(lambda: robot.step(TIME_STEP)) if robot is not None else None)
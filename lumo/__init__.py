@@ -0,0 +1,6 @@
+# lumo/__init__.py
+#
+# Shared building blocks for the Lumo Webots controllers.
+#
+# The controllers in controllers/lumo_*/ put the repository root on sys.path
+# and import from here, so a fix made in this package reaches both of them.
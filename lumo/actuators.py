@@ -0,0 +1,82 @@
+# lumo/actuators.py
+#
+# Write batching and deduplication for Webots actuators. Gestures, the idle
+# neutral reset and the LED cues keep commanding the same values; every such
+# call crosses into the Webots C API. Here every Motor/LED is wrapped in a
+# proxy that only records the newest value per command, and ActuatorBus.flush()
+# (once per robot.step) sends just the values that differ from what the device
+# was last told. An optional listener sees every command that is actually
+# sent (the session recorder uses it).
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class BufferedDevice:
+    """Stand-in for a Webots Motor or LED whose set* calls go through an ActuatorBus."""
+
+    def __init__(self, device, bus: "ActuatorBus", name: str = ""):
+        self.device = device
+        self.name = name
+        self._bus = bus
+
+    def setPosition(self, position: float):
+        self._bus.queue(self, "setPosition", position)
+
+    def setVelocity(self, velocity: float):
+        self._bus.queue(self, "setVelocity", velocity)
+
+    def set(self, value: int):
+        self._bus.queue(self, "set", value)
+
+    def __getattr__(self, name: str):
+        return getattr(self.device, name)   # getters, sensors, ... unbuffered
+
+
+class ActuatorBus:
+    """
+    Collects actuator commands during a control step and sends the changed
+    ones in flush(). Within a step the last value per (device, command) wins.
+    sent and skipped count the API calls made and saved. listener, if set,
+    is called as listener(device name, command, value) for every sent command.
+    """
+
+    def __init__(self, listener: Optional[Callable[[str, str, float], None]] = None):
+        self.listener = listener
+        self._pending: Dict[Tuple[int, str], Tuple[BufferedDevice, float]] = {}
+        self._last: Dict[Tuple[int, str], float] = {}
+        self._devices: Dict[int, BufferedDevice] = {}
+        self.sent = 0
+        self.skipped = 0
+
+    def wrap(self, device, name: str = "") -> BufferedDevice:
+        """The buffered proxy for a Webots device (one proxy per device)."""
+        proxy = self._devices.get(id(device))
+        if proxy is None:
+            proxy = self._devices[id(device)] = BufferedDevice(device, self, name)
+        return proxy
+
+    def wrap_all(self, devices) -> List[BufferedDevice]:
+        return [self.wrap(device) for device in devices]
+
+    def queue(self, proxy: BufferedDevice, command: str, value):
+        self._pending[(id(proxy), command)] = (proxy, value)
+
+    def flush(self):
+        """Send every pending command whose value changed since it was last sent."""
+        if not self._pending:
+            return
+        last, listener = self._last, self.listener
+        for key, (proxy, value) in self._pending.items():
+            if last.get(key) == value:
+                self.skipped += 1
+                continue
+            getattr(proxy.device, key[1])(value)
+            last[key] = value
+            self.sent += 1
+            if listener is not None:
+                listener(proxy.name, key[1], value)
+        self._pending.clear()
+
+    def forget(self):
+        """Drop the sent-value cache, e.g. after a device was moved behind the bus's back."""
+        self._last.clear()
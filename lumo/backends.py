@@ -0,0 +1,236 @@
+# lumo/backends.py
+#
+# Pluggable emotion backends. Every backend does the same two things: find
+# faces in a BGR frame, and turn face crops into probability vectors over
+# EMOTION_LABELS. The rest of the pipeline only talks to this interface, so
+# the model can be swapped with one config value (see make_backend()).
+#
+#   deepface  DeepFace's Keras emotion model (needs TensorFlow)
+#   onnx      FER+ emotion network run through ONNX Runtime or cv2.dnn (CPU)
+
+import os
+import time
+from typing import List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from lumo.events import log
+from lumo.faces import Box, HaarDetector, crop_face
+from lumo.startup import StartupTimer
+
+# Frames are downscaled to this size before analysis to keep model load low
+# (EmotionWorker's detect() input, and the warm-up frame).
+ANALYSIS_W = 160
+ANALYSIS_H = 120
+
+# Label order of every probability vector in the pipeline (DeepFace's order).
+EMOTION_LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+
+# Default location of the FER+ model for the onnx backend.
+DEFAULT_ONNX_MODEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "models", "emotion-ferplus-8.onnx")
+
+
+class EmotionBackend:
+    """
+    Base class: detect faces, then classify face crops.
+
+    load() imports and builds the model and runs one warm-up pass (detect,
+    then classify) on a blank analysis-size frame so the first real frame
+    does not stall; stage times go to timer when given.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._detector = None
+
+    def load(self, timer: Optional[StartupTimer] = None, background: bool = False):
+        raise NotImplementedError
+
+    def detect(self, frame: np.ndarray) -> List[Box]:
+        """Return face boxes (x, y, w, h) in frame; Haar cascade by default."""
+        if self._detector is None:
+            self._detector = HaarDetector()
+        return self._detector(frame)
+
+    def classify(self, faces: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        Return an (N, len(EMOTION_LABELS)) float32 array of probabilities for
+        N BGR crops, in one forward pass where the model allows it.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _record(timer: Optional[StartupTimer], name: str, since: float, background: bool):
+        if timer is not None:
+            timer.add(name, time.perf_counter() - since, background)
+
+    def _warm_up(self):
+        """Run the worker's path once on a blank frame: build the detector, then classify one crop."""
+        frame = np.zeros((ANALYSIS_H, ANALYSIS_W, 3), dtype=np.uint8)
+        boxes = self.detect(frame)
+        box = boxes[0] if boxes else (0, 0, frame.shape[1], frame.shape[0])   # no face in a blank frame
+        self.classify([crop_face(frame, box)])
+
+
+class DeepFaceBackend(EmotionBackend):
+    """
+    DeepFace's emotion model on pre-cropped faces.
+
+    Crops are stacked into one (N, 48, 48, 1) batch and fed straight to the
+    Keras model behind DeepFace; if that model is not reachable (unknown
+    deepface version) each crop goes through DeepFace.analyze instead.
+    """
+
+    name = "deepface"
+    input_size = 48
+
+    def __init__(self):
+        super().__init__()
+        self.deepface = None
+        self._model = None
+
+    def load(self, timer: Optional[StartupTimer] = None, background: bool = False):
+        if self.deepface is not None:
+            return
+        t = time.perf_counter()
+        from deepface import DeepFace
+        self._record(timer, "import deepface", t, background)
+
+        t = time.perf_counter()
+        try:
+            client = DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+        except TypeError:
+            client = DeepFace.build_model("Emotion")   # deepface < 0.0.90
+        model = getattr(client, "model", client)       # Keras model behind the client
+        self._model = model if hasattr(model, "predict_on_batch") else None
+        self._record(timer, "build emotion model", t, background)
+
+        t = time.perf_counter()
+        self.deepface = DeepFace
+        self._warm_up()
+        self._record(timer, "warm-up inference", t, background)
+
+    def classify(self, faces: Sequence[np.ndarray]) -> np.ndarray:
+        if self.deepface is None:
+            self.load()
+        if self._model is not None:
+            batch = np.stack([self._preprocess(face) for face in faces])
+            return np.asarray(self._model.predict_on_batch(batch), dtype=np.float32)
+        probs = np.zeros((len(faces), len(EMOTION_LABELS)), dtype=np.float32)
+        for i, face in enumerate(faces):
+            analytics = self.deepface.analyze(face, actions=["emotion"],
+                                              enforce_detection=False, detector_backend="skip")
+            if log.debugging:
+                log.debug("DEBUG", f"Raw DeepFace output: {analytics}")
+            if isinstance(analytics, list) and len(analytics) > 0:
+                analytics = analytics[0]
+            emotions = analytics.get("emotion", {}) if isinstance(analytics, dict) else {}
+            probs[i] = [emotions.get(label, 0.0) for label in EMOTION_LABELS]
+        return probs / 100.0
+
+    def _preprocess(self, face: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        gray = cv2.resize(gray, (self.input_size, self.input_size))
+        return (gray.astype(np.float32) / 255.0)[..., np.newaxis]   # 48x48x1, 0..1
+
+
+# FER+ output order: neutral, happiness, surprise, sadness, anger, disgust, fear, contempt.
+# Column j of the FER+ scores feeds EMOTION_LABELS[_FERPLUS_TO_LABELS[j]]; contempt
+# has no DeepFace counterpart and is folded into disgust.
+_FERPLUS_TO_LABELS = np.array([6, 3, 5, 4, 0, 1, 2, 1])
+
+
+class OnnxBackend(EmotionBackend):
+    """
+    FER+ (ONNX model zoo, emotion-ferplus-8.onnx): 64x64 grayscale in, 8 scores out.
+    Runs on ONNX Runtime when it is installed, otherwise on cv2.dnn. Crops go
+    through as one N x 1 x 64 x 64 batch unless the model has a fixed batch
+    size of 1, in which case they are run one by one.
+    """
+
+    name = "onnx"
+    input_size = 64
+
+    def __init__(self, model_path: str = DEFAULT_ONNX_MODEL):
+        super().__init__()
+        self.model_path = model_path
+        self._session = None
+        self._net = None
+        self._batched = True
+
+    def load(self, timer: Optional[StartupTimer] = None, background: bool = False):
+        if self._session is not None or self._net is not None:
+            return
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"ONNX emotion model not found: {self.model_path}")
+        t = time.perf_counter()
+        try:
+            import onnxruntime
+        except ImportError:
+            onnxruntime = None
+        if onnxruntime is not None:
+            self._session = onnxruntime.InferenceSession(self.model_path, providers=["CPUExecutionProvider"])
+            model_input = self._session.get_inputs()[0]
+            self._input = model_input.name
+            self._batched = model_input.shape[0] != 1
+            runtime = "onnxruntime"
+        else:
+            self._net = cv2.dnn.readNetFromONNX(self.model_path)
+            self._net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            self._net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            runtime = "cv2.dnn"
+        self._record(timer, f"load FER+ ({runtime})", t, background)
+
+        t = time.perf_counter()
+        self._warm_up()
+        self._record(timer, "warm-up inference", t, background)
+
+    def classify(self, faces: Sequence[np.ndarray]) -> np.ndarray:
+        if self._session is None and self._net is None:
+            self.load()
+        blob = np.stack([self._preprocess(face) for face in faces])   # N x 1 x 64 x 64
+        scores = None
+        if self._batched and len(faces) > 1:
+            try:
+                scores = self._forward(blob)
+            except Exception as e:
+                print(f"[INFO] FER+ model does not take batches ({e}); classifying faces one by one.")
+                self._batched = False
+        if scores is None:
+            scores = np.concatenate([self._forward(blob[i:i + 1]) for i in range(len(faces))])
+
+        e = np.exp(scores - scores.max(axis=1, keepdims=True))
+        e /= e.sum(axis=1, keepdims=True)
+        probs = np.zeros((len(faces), len(EMOTION_LABELS)), dtype=np.float32)
+        for j, label in enumerate(_FERPLUS_TO_LABELS):
+            probs[:, label] += e[:, j]
+        return probs
+
+    def _forward(self, blob: np.ndarray) -> np.ndarray:
+        if self._session is not None:
+            return self._session.run(None, {self._input: blob})[0]
+        self._net.setInput(blob)
+        return self._net.forward()
+
+    def _preprocess(self, face: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        gray = cv2.resize(gray, (self.input_size, self.input_size))
+        return gray.astype(np.float32)[np.newaxis]   # 1x64x64, raw 0..255
+
+
+BACKENDS = {
+    DeepFaceBackend.name: DeepFaceBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def make_backend(name: str, **options) -> EmotionBackend:
+    """Create the backend registered under name (see BACKENDS)."""
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown emotion backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return cls(**options)
@@ -0,0 +1,108 @@
+# lumo/behavior.py
+#
+# Preemptible behavior scheduler. A reaction is a Behavior: a priority plus a
+# few tracks (motion, speech, LEDs), each a generator that does one control
+# step of work and then yields. The scheduler steps every live track once per
+# robot.step, so the tracks run side by side and none of them blocks the
+# loop. A new behavior of equal or higher priority preempts the running one
+# at once. The old behavior's tracks are closed, and each track cleans up in
+# its finally block: moved joints return to rest, unspoken lines are dropped
+# and the LEDs go off. A new reaction therefore waits at most one control
+# step, not a whole gesture.
+
+from typing import Callable, Dict, Generator, Optional
+
+from lumo.events import log
+
+# One track: next() runs one control step; StopIteration means finished.
+Track = Generator[None, None, None]
+
+
+class Behavior:
+    """A named, prioritised set of tracks played together; done once every track has finished."""
+
+    def __init__(self, name: str, priority: int = 0, tracks: Optional[Dict[str, Track]] = None):
+        self.name = name
+        self.priority = priority
+        self.tracks: Dict[str, Track] = dict(tracks or {})
+        self.steps = 0
+
+    def add(self, name: str, track: Track) -> "Behavior":
+        self.tracks[name] = track
+        return self
+
+    def running(self, *names: str) -> bool:
+        """True while any of the named tracks (any track when none are named) has not finished."""
+        return any(name in self.tracks for name in (names or tuple(self.tracks)))
+
+    def tick(self) -> bool:
+        """Step every live track once, in the order they were added. Returns True while any is left."""
+        self.steps += 1
+        for name, track in list(self.tracks.items()):
+            try:
+                next(track)
+            except StopIteration:
+                del self.tracks[name]
+        return bool(self.tracks)
+
+    def close(self):
+        """Stop every track now, running its cleanup."""
+        tracks, self.tracks = self.tracks, {}
+        for track in tracks.values():
+            track.close()
+
+
+class BehaviorScheduler:
+    """
+    Plays one Behavior at a time, one control step per tick().
+
+    start() preempts the current behavior unless that one has a strictly
+    higher priority, in which case the new one is dropped. on_done(behavior,
+    interrupted), if given, is called whenever a behavior ends.
+    """
+
+    def __init__(self, on_done: Optional[Callable[[Behavior, bool], None]] = None):
+        self.on_done = on_done
+        self.current: Optional[Behavior] = None
+
+    @property
+    def active(self) -> bool:
+        return self.current is not None
+
+    def start(self, behavior: Behavior) -> bool:
+        """Play behavior from the next tick on. Returns False if it was dropped."""
+        current = self.current
+        if current is not None:
+            if current.priority > behavior.priority:
+                log.info("BEHAVIOR", f"{behavior.name} (priority {behavior.priority}) dropped: "
+                                     f"{current.name} (priority {current.priority}) is playing",
+                         behavior=behavior.name, playing=current.name)
+                return False
+            log.info("BEHAVIOR", f"{current.name} interrupted by {behavior.name}",
+                     behavior=behavior.name, interrupted=current.name)
+            self._finish(interrupted=True)
+        self.current = behavior
+        return True
+
+    def cancel(self, reason: str):
+        """Stop the current behavior (if any) and let its tracks clean up."""
+        if self.current is None:
+            return
+        log.info("BEHAVIOR", f"{self.current.name} cancelled: {reason}", cancelled=self.current.name)
+        self._finish(interrupted=True)
+
+    def tick(self) -> bool:
+        """Advance the current behavior by one control step. Returns True while one is playing."""
+        current = self.current
+        if current is None:
+            return False
+        if not current.tick():
+            self._finish(interrupted=False)
+            return False
+        return True
+
+    def _finish(self, interrupted: bool):
+        behavior, self.current = self.current, None
+        behavior.close()
+        if self.on_done is not None:
+            self.on_done(behavior, interrupted)
@@ -0,0 +1,291 @@
+# lumo/benchmark.py
+#
+# Reproducible benchmark of the perception pipeline on a fixed local clip set.
+#
+#   python -m lumo.benchmark clips/ --backends onnx deepface --batch-sizes 1 4 --out bench.json
+#
+# clips/ holds video files and/or directories of images; an optional
+# clips/labels.csv with rows "clip,frame,label" (frame = 0-based index within
+# the clip, label one of EMOTION_LABELS) enables the accuracy column.
+#
+# Every combination of capture resolution, analysis downscale, detector,
+# classifier backend and batch size runs in a fresh process, so peak RSS is
+# per configuration and one model's memory does not leak into the next. Model
+# loading and warm-up are timed separately; the measured path is, per frame:
+# downscale -> face detection -> crop -> classification (batched across
+# `batch` frames) -> smoothing, exactly as in EmotionWorker/EmotionFilter.
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from lumo.backends import BACKENDS, EMOTION_LABELS, make_backend
+from lumo.faces import FaceTracker, HaarDetector, crop_face
+from lumo.inference import ANALYSIS_H, ANALYSIS_W
+from lumo.replay import IMAGE_EXTENSIONS, ReplayCapture
+from lumo.smoothing import EmotionFilter
+
+DETECTORS = ("tracker", "haar", "none")   # Haar + ROI tracking, Haar every frame, whole frame
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+
+
+@dataclass
+class BenchConfig:
+    """One point of the benchmark grid."""
+    width: int             # capture resolution (DISPLAY_W x DISPLAY_H)
+    height: int
+    analysis: str          # "160x120" or "native" (no downscale before detection)
+    detector: str          # one of DETECTORS
+    backend: str           # key of lumo.backends.BACKENDS
+    batch: int             # frames whose face crops share one classify() call
+
+    @property
+    def label(self) -> str:
+        return f"{self.width}x{self.height} {self.analysis} {self.detector} {self.backend} b{self.batch}"
+
+
+def find_clips(clip_dir: str) -> List[str]:
+    """Video files and image directories in clip_dir, sorted by name."""
+    clips = []
+    for name in sorted(os.listdir(clip_dir)):
+        path = os.path.join(clip_dir, name)
+        if os.path.isdir(path) or name.lower().endswith(VIDEO_EXTENSIONS + IMAGE_EXTENSIONS):
+            clips.append(path)
+    return clips
+
+
+def load_labels(clip_dir: str) -> Dict[Tuple[str, int], str]:
+    """(clip name, frame index) -> label from clip_dir/labels.csv, if present."""
+    path = os.path.join(clip_dir, "labels.csv")
+    labels = {}
+    if os.path.exists(path):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                labels[(row["clip"], int(row["frame"]))] = row["label"].strip()
+    return labels
+
+
+def load_frames(path: str, width: int, height: int, max_frames: Optional[int]) -> List[np.ndarray]:
+    """Decode a clip (or a single image) and resize every frame to width x height."""
+    if path.lower().endswith(IMAGE_EXTENSIONS):
+        image = cv2.imread(path)
+        return [] if image is None else [cv2.resize(image, (width, height))]
+    cap = ReplayCapture(path)
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ok, frame = cap.read()
+        if not ok or frame is None:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    cap.release()
+    return frames
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB (None if unavailable)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024.0 * 1024.0)
+    except ImportError:
+        return None
+
+
+def run_config(config: BenchConfig, clip_dir: str, max_frames: Optional[int] = None) -> dict:
+    """Measure one configuration in the current process."""
+    labels = load_labels(clip_dir)
+    clips = [(os.path.basename(path), load_frames(path, config.width, config.height, max_frames))
+             for path in find_clips(clip_dir)]
+
+    t = time.perf_counter()
+    backend = make_backend(config.backend)
+    backend.load()
+    load_s = time.perf_counter() - t
+
+    tracker = None
+    if config.detector == "tracker":
+        tracker = FaceTracker(detector=HaarDetector())
+        detector = tracker.update
+    elif config.detector == "haar":
+        haar = HaarDetector()
+        detector = lambda frame: sorted(haar(frame), key=lambda b: b[2] * b[3], reverse=True)
+    else:
+        detector = None
+
+    latencies: List[float] = []
+    predictions: Dict[Tuple[str, int], Optional[str]] = {}
+    faces_seen = 0
+    classify_calls = 0
+    emotion_filter = EmotionFilter(EMOTION_LABELS)
+    pending = []   # (clip, index, start time, number of crops)
+    crops: List[np.ndarray] = []
+
+    def flush():
+        nonlocal classify_calls
+        probs = backend.classify(crops) if crops else np.zeros((0, len(EMOTION_LABELS)), np.float32)
+        classify_calls += 1 if crops else 0
+        row = 0
+        for clip, index, start, n in pending:
+            # The largest face (first crop) is the target, as in EmotionWorker's default policy.
+            target = probs[row] if n else None
+            emotion_filter.update(target)
+            predictions[(clip, index)] = None if target is None else EMOTION_LABELS[int(np.argmax(target))]
+            latencies.append(time.perf_counter() - start)
+            row += n
+        pending.clear()
+        crops.clear()
+
+    t = time.perf_counter()
+    for name, frames in clips:
+        if tracker is not None:
+            tracker.reset()
+        emotion_filter.reset()
+        for index, frame in enumerate(frames):
+            start = time.perf_counter()
+            if config.analysis == "native":
+                small = frame
+            else:
+                small = cv2.resize(frame, (ANALYSIS_W, ANALYSIS_H))
+            if detector is None:
+                faces = [small]
+            else:
+                faces = [crop_face(small, box) for box in detector(small)]
+            faces_seen += len(faces)
+            crops.extend(faces)
+            pending.append((name, index, start, len(faces)))
+            if len(pending) >= config.batch:
+                flush()
+        if pending:
+            flush()
+    total_s = time.perf_counter() - t
+
+    frames_total = sum(len(frames) for _, frames in clips)
+    ms = np.array(latencies) * 1e3 if latencies else np.zeros(1)
+    labelled = [key for key in labels if key in predictions]
+    correct = sum(predictions[key] == labels[key] for key in labelled)
+    return {
+        "config": asdict(config),
+        "frames": frames_total,
+        "faces": faces_seen,
+        "classify_calls": classify_calls,
+        "load_s": round(load_s, 3),
+        "total_s": round(total_s, 3),
+        "throughput_fps": round(frames_total / total_s, 2) if total_s > 0 else None,
+        "latency_ms": {"p50": round(float(np.percentile(ms, 50)), 3),
+                       "p95": round(float(np.percentile(ms, 95)), 3),
+                       "p99": round(float(np.percentile(ms, 99)), 3),
+                       "mean": round(float(ms.mean()), 3)},
+        "peak_rss_mb": peak_rss_mb(),
+        "labelled_frames": len(labelled),
+        "accuracy": round(correct / len(labelled), 4) if labelled else None,
+    }
+
+
+def _child(config: BenchConfig, clip_dir: str, max_frames: Optional[int], results):
+    try:
+        results.put(run_config(config, clip_dir, max_frames))
+    except Exception as e:
+        results.put({"config": asdict(config), "error": f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(config: BenchConfig, clip_dir: str, max_frames: Optional[int] = None,
+                 poll: float = 1.0) -> dict:
+    """
+    run_config() in a fresh process, so peak RSS belongs to this configuration
+    alone. A child that dies without a result (crash, OOM kill) gives an
+    error entry with its exit code instead of hanging the grid.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(config, clip_dir, max_frames, results))
+    proc.start()
+    while True:
+        try:
+            result = results.get(timeout=poll)
+            break
+        except queue.Empty:
+            if proc.is_alive():
+                continue
+            try:   # it may have put its result just before exiting
+                result = results.get(timeout=poll)
+            except queue.Empty:
+                result = {"config": asdict(config), "error": f"exit {proc.exitcode}"}
+            break
+    proc.join()
+    return result
+
+
+def _size(text: str) -> Tuple[int, int]:
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the Lumo perception pipeline on a clip set.")
+    parser.add_argument("clips", help="directory of video files / image directories (+ optional labels.csv)")
+    parser.add_argument("--resolutions", nargs="+", default=["320x240"], help="capture sizes, WxH")
+    parser.add_argument("--analysis", nargs="+", default=[f"{ANALYSIS_W}x{ANALYSIS_H}"],
+                        choices=[f"{ANALYSIS_W}x{ANALYSIS_H}", "native"])
+    parser.add_argument("--detectors", nargs="+", default=["tracker"], choices=DETECTORS)
+    parser.add_argument("--backends", nargs="+", default=["onnx"], choices=list(BACKENDS))
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1])
+    parser.add_argument("--max-frames", type=int, help="use at most this many frames per clip")
+    parser.add_argument("--out", default="benchmark.json", help="JSON results file")
+    args = parser.parse_args(argv)
+
+    if not find_clips(args.clips):
+        parser.error(f"no clips found in {args.clips}")
+    configs = [BenchConfig(w, h, analysis, detector, backend, batch)
+               for w, h in map(_size, args.resolutions)
+               for analysis in args.analysis
+               for detector in args.detectors
+               for backend in args.backends
+               for batch in args.batch_sizes]
+
+    results = []
+    for i, config in enumerate(configs, 1):
+        print(f"[BENCH] ({i}/{len(configs)}) {config.label}")
+        result = run_isolated(config, args.clips, args.max_frames)
+        if "error" in result:
+            print(f"[WARN]   failed: {result['error']}")
+        else:
+            lat = result["latency_ms"]
+            acc = "-" if result["accuracy"] is None else f"{result['accuracy'] * 100:.1f}%"
+            rss = "-" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f} MiB"
+            print(f"[BENCH]   p50 {lat['p50']:.1f} / p95 {lat['p95']:.1f} / p99 {lat['p99']:.1f} ms, "
+                  f"{result['throughput_fps']} frames/s, peak RSS {rss}, accuracy {acc}")
+        results.append(result)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "clips": [os.path.basename(path) for path in find_clips(args.clips)],
+        "max_frames": args.max_frames,
+        "machine": {"platform": platform.platform(), "processor": platform.processor(),
+                    "cpus": os.cpu_count(), "python": platform.python_version(),
+                    "opencv": cv2.__version__, "numpy": np.__version__},
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
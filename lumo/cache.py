@@ -0,0 +1,81 @@
+# lumo/cache.py
+#
+# Emotion results cached by what the face looks like. A face crop is reduced
+# to a difference hash (a 16x16 grid of "brighter than the pixel to the
+# right?" bits), so the same person making the same expression again maps to
+# the same or a nearby signature. Near-duplicates (Hamming distance up to
+# max_distance) are answered from the cache instead of running the emotion
+# model. The cache is bounded: least recently used entries are evicted past
+# size, and entries older than ttl seconds are dropped.
+
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 16
+
+
+def signature(crop: np.ndarray, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash of a BGR (or grayscale) face crop, as a hash_size**2-bit integer."""
+    gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class EmotionCache:
+    """
+    Bounded LRU/TTL map from crop signature to emotion probability vector.
+
+    get() returns the vector of the closest cached signature within
+    max_distance bits (0: exact matches only) and counts a hit or a miss.
+    ttl=None keeps entries until they are evicted.
+    """
+
+    def __init__(self, size: int = 256, ttl: Optional[float] = 30.0, max_distance: int = 8,
+                 clock: Callable[[], float] = time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: int) -> Optional[np.ndarray]:
+        """The cached vector for key or a near-duplicate of it, or None."""
+        now = self.clock()
+        match = key if key in self._entries else None
+        if match is None and self.max_distance:
+            best = self.max_distance + 1
+            for cached in self._entries:
+                d = bin(cached ^ key).count("1")
+                if d < best:
+                    match, best = cached, d
+        if match is not None:
+            probs, stored = self._entries[match]
+            if self.ttl is None or now - stored <= self.ttl:
+                self._entries.move_to_end(match)
+                self.hits += 1
+                return probs
+            del self._entries[match]
+        self.misses += 1
+        return None
+
+    def put(self, key: int, probs: np.ndarray):
+        """Cache probs under key, evicting the least recently used entries past size."""
+        self._entries[key] = (probs, self.clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
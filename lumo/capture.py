@@ -0,0 +1,108 @@
+# lumo/capture.py
+#
+# Threaded webcam capture. A background thread keeps draining the camera into
+# a small preallocated ring of frames, so the driver never queues up stale
+# images and the control loop always sees the newest one.
+
+import threading
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class FrameGrabber:
+    """
+    Latest-frame-wins capture from an opened cv2.VideoCapture.
+
+    Frames land in a ring of `slots` preallocated (height, width, 3) uint8
+    buffers. latest() returns a view of the newest buffer without copying it;
+    the grabber never writes into the buffer handed out last, so the view stays
+    valid until the next latest() call. Frames that were never picked up are
+    simply overwritten.
+    """
+
+    def __init__(self, cap, width: int, height: int, slots: int = 3):
+        if slots < 3:
+            raise ValueError("FrameGrabber needs at least 3 slots")
+        self.cap = cap
+        self.width = width
+        self.height = height
+        self._ring = np.zeros((slots, height, width, 3), dtype=np.uint8)
+        self._raw = None          # reused read buffer when the camera size differs
+        self._native = None       # True once the camera is known to deliver width x height
+        self._lock = threading.Lock()
+        self._first = threading.Event()
+        self._latest = -1         # slot holding the newest frame
+        self._held = -1           # slot last handed out by latest()
+        self._seq = 0
+        self._ok = False
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the capture thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """Stop the capture thread (does not release the VideoCapture)."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wait_first(self, timeout: float = 5.0) -> bool:
+        """Block until the first frame arrived; False on timeout."""
+        return self._first.wait(timeout)
+
+    def latest(self) -> Tuple[int, Optional[np.ndarray]]:
+        """
+        Return (seq, frame) for the newest frame.
+        seq grows by one per captured frame; frame is None if the last read failed.
+        """
+        with self._lock:
+            if not self._ok or self._latest < 0:
+                return self._seq, None
+            self._held = self._latest
+            return self._seq, self._ring[self._held]
+
+    def _next_slot(self) -> int:
+        with self._lock:
+            busy = (self._latest, self._held)
+        for i in range(len(self._ring)):
+            if i not in busy:
+                return i
+        return 0  # unreachable with slots >= 3
+
+    def _run(self):
+        while self._running:
+            slot = self._next_slot()
+            dst = self._ring[slot]
+            if self._native:
+                ok, frame = self.cap.read(dst)
+            else:
+                ok, frame = self.cap.read(self._raw)
+            if not ok or frame is None:
+                with self._lock:
+                    self._ok = False
+                time.sleep(0.01)
+                continue
+
+            if self._native is None:
+                self._native = frame.shape[:2] == (self.height, self.width)
+                print(f"[INFO] Camera delivers {frame.shape[1]}x{frame.shape[0]}"
+                      f"{'' if self._native else f', resizing to {self.width}x{self.height}'}.")
+            if self._native:
+                if frame is not dst:
+                    np.copyto(dst, frame)
+            else:
+                self._raw = frame
+                cv2.resize(frame, (self.width, self.height), dst=dst)
+
+            with self._lock:
+                self._latest = slot
+                self._seq += 1
+                self._ok = True
+            self._first.set()
@@ -0,0 +1,479 @@
+# lumo/core.py
+#
+# The controller pipeline, shared by every Lumo controller: webcam capture,
+# background emotion inference, smoothing, speech, LEDs, the behavior
+# scheduler and the main Webots loop. A controller only supplies its settings
+# (LumoConfig) and a BehaviorProfile that decides what a reaction looks like,
+# e.g. LEDs and speech only (lumo_minimal) or full-body gestures
+# (lumo_expressive).
+
+import random
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+from lumo.actuators import ActuatorBus
+from lumo.behavior import Behavior, BehaviorScheduler, Track
+from lumo.backends import EMOTION_LABELS
+from lumo.events import log
+from lumo.inference import SKIP_MAX_STALE, SKIP_THRESHOLD
+from lumo.instrumentation import LoopInstruments
+from lumo.leds import LedBank, compile_animations, emotion_colors, emotion_patterns
+from lumo.motion import Gesture, MotionSequencer, Targets, Trajectory
+from lumo.perception import NoCamera, RemoteWorker
+from lumo.pipeline import build_worker, open_webcam, start_worker
+from lumo.preview import WINDOW, HeadlessPreview, PreviewRenderer
+from lumo.recording import SessionRecorder
+from lumo.smoothing import EmotionFilter
+from lumo.speech import SpeechService
+from lumo.startup import StartupTimer
+from lumo.synthetic import PassThroughFilter, SilentSpeech, SyntheticDriver, parse_script
+
+# Model label -> reaction played for it. Labels without an entry (disgust,
+# neutral) are not reacted to.
+REACTIONS = {
+    "happy": "happy",
+    "sad": "sad",
+    "angry": "angry",
+    "fear": "frightened", "fearful": "frightened", "frightened": "frightened",
+    "surprise": "surprise",
+}
+
+# How each reaction is announced in the log: (action name, LED colour name).
+_ANNOUNCE = {
+    "happy":      ("HAPPY", "GREEN"),
+    "sad":        ("SAD", "BLUE"),
+    "angry":      ("ANGRY", "RED"),
+    "frightened": ("FRIGHTENED", "YELLOW"),
+    "surprise":   ("SURPRISED", "MAGENTA"),
+}
+
+# A reaction line table entry: one line, or several spoken in order.
+Line = Union[str, Tuple[str, ...]]
+
+
+def controller_arg(name: str, default: Optional[str] = None, argv: Optional[Sequence[str]] = None) -> Optional[str]:
+    """The value of a "--name=value" controller argument (Webots controllerArgs), else default."""
+    prefix = f"--{name}="
+    for arg in (sys.argv if argv is None else argv)[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix):] or None
+    return default
+
+
+def _default_reaction_priority() -> Dict[str, int]:
+    return {"happy": 1, "sad": 1, "surprise": 2, "angry": 2, "frightened": 3}
+
+
+@dataclass
+class LumoConfig:
+    """Controller settings; see section 1 of the controllers for what each one does."""
+    time_step: int = 32                       # [ms] Webots control loop
+    webcam_id: int = 0
+    display_w: int = 320
+    display_h: int = 240
+    emotion_backend: str = "deepface"
+    target_policy: str = "largest"
+    inference_workers: int = 0                # 0: one inference thread in this process
+    perception: Optional[str] = None          # "host:port" of a perception host; None: own webcam + model
+    synthetic: Optional[str] = None           # emotion script instead of webcam + model (lumo.synthetic)
+    skip_threshold: Optional[float] = SKIP_THRESHOLD   # None: classify every frame
+    skip_max_stale: int = SKIP_MAX_STALE
+    cache_size: int = 256                     # 0: no emotion cache
+    cache_ttl: Optional[float] = 30.0         # [s]
+    cache_max_distance: int = 8               # [bits] of the 256-bit crop signature
+    parallel_model_load: bool = True
+    speech_rate: int = 150                    # [words per minute]
+    tts_cache_dir: Optional[str] = None
+    emotion_window: int = 5
+    emotion_enter: float = 0.55
+    emotion_exit: float = 0.35
+    emotion_cooldown: float = 10.0
+    preview_fps: float = 10.0
+    headless: bool = False                    # no preview window at all
+    perf_summary_every: Optional[float] = 10.0
+    perf_dump: Optional[str] = None
+    event_log: Optional[str] = None           # JSONL file of loop events (None: console only)
+    log_level: str = "INFO"                   # console: "DEBUG", "INFO", "WARN" or "ERROR"
+    debug_every: int = 0                      # keep every N-th debug record; 0: debug off
+    record_dir: Optional[str] = None          # new session directory under here per run; None: off
+    record_frame_every: int = 1               # keep every N-th analysed frame; 0: no frames
+    record_frame_scale: float = 0.5
+    record_jpeg_quality: Optional[int] = 80   # None: raw BGR
+    led_colors: Dict[str, int] = field(default_factory=emotion_colors)
+    led_patterns: Dict[str, Dict[str, Tuple[str, int]]] = field(default_factory=emotion_patterns)
+    reaction_priority: Dict[str, int] = field(default_factory=_default_reaction_priority)
+    user_lost_after: Optional[float] = 2.0    # [s] without a face before a reaction is cancelled
+
+
+class BehaviorProfile:
+    """
+    What Lumo does with a triggered emotion.
+
+    lines maps each reaction (see REACTIONS) to its line table. A reaction is
+    played as a Behavior with up to three tracks: motion (the profile's
+    gesture, if any), speech (one entry of the line table) and LEDs (the
+    emotion's animation, lit until motion and speech have finished).
+    Profiles with motors override setup() to fetch them, fill in joints and
+    rest_pose for the sequencer, and override gesture() and neutral().
+    """
+
+    name = "base"
+    lines: Dict[str, Sequence[Line]] = {}
+
+    def __init__(self):
+        self.lumo: Optional["Lumo"] = None
+        self.joints: Dict[str, object] = {}
+        self.rest_pose: Targets = {}
+
+    def setup(self, lumo: "Lumo"):
+        """Called once the robot exists; fetch devices (lumo.device(name)) and move to neutral here."""
+        self.lumo = lumo
+
+    def behavior(self, reaction: str) -> Behavior:
+        """Build the Behavior played for reaction, prioritised by config.reaction_priority."""
+        lumo = self.lumo
+        behavior = Behavior(reaction, lumo.config.reaction_priority.get(reaction, 0))
+        lines = self.pick(reaction)
+        gesture = self.gesture(reaction, lines)
+        if gesture is not None:
+            behavior.add("motion", lumo.motion_track(gesture))
+            lines = ()   # the gesture speaks them with say() cues, in time with the motion
+        behavior.add("speech", lumo.speech_track(lines, hold=lambda: behavior.running("motion")))
+        behavior.add("leds", lumo.led_track(reaction, hold=lambda: behavior.running("motion", "speech")))
+        return behavior
+
+    def gesture(self, reaction: str, lines: Tuple[str, ...]) -> Optional[Union[Gesture, Trajectory]]:
+        """The motion played for reaction, speaking lines through say() cues; None for no motion."""
+        return None
+
+    def neutral(self):
+        """Return motors to neutral; called while no reaction is playing."""
+
+    # Gesture building blocks -------------------------------------------------
+
+    def pick(self, reaction: str) -> Tuple[str, ...]:
+        """A random entry of the reaction's line table, as a tuple of lines."""
+        entry = random.choice(self.lines[reaction])
+        return (entry,) if isinstance(entry, str) else tuple(entry)
+
+    def say(self, text: str) -> Callable[[], None]:
+        """Keyframe action: queue text for speech (does not wait for it)."""
+        return lambda: self.lumo.speak(text)
+
+    def speaking(self) -> bool:
+        """True until every queued line has been spoken."""
+        return self.lumo.speech.busy
+
+
+class Lumo:
+    """
+    One Lumo controller: run() sets everything up, runs the Webots loop until
+    the simulation ends or ESC is pressed in the webcam window, then cleans up.
+    """
+
+    def __init__(self, config: LumoConfig, profile: BehaviorProfile):
+        self.config = config
+        self.profile = profile
+
+    def run(self):
+        self.start()
+        try:
+            self.loop()
+        finally:
+            self.shutdown()
+
+    # Setup -------------------------------------------------------------------
+
+    def start(self):
+        cfg = self.config
+        log.configure(cfg.event_log, console_level=cfg.log_level, debug_every=cfg.debug_every)
+
+        self.startup = StartupTimer()
+        self.perf = LoopInstruments(cfg.time_step, summary_every=cfg.perf_summary_every,
+                                    dump_path=cfg.perf_dump)
+        self.pool = None
+        self.preloader = None
+        self.source = None   # where results come from when there is no local webcam + model
+        self.driver = None
+        if cfg.synthetic:
+            # Scripted emotions in simulation time, straight into dispatch (lumo.synthetic)
+            self.source = self.driver = SyntheticDriver(parse_script(cfg.synthetic), clock=lambda: self.robot.getTime())
+            self.source.start()
+        elif cfg.perception:
+            # A perception host (lumo.perception) owns the webcam and the model; results arrive by socket
+            self.source = RemoteWorker(cfg.perception)
+            self.source.start()
+
+        if self.source is not None:
+            self.cap = None
+            self.grabber = NoCamera()
+            self.preview = HeadlessPreview()   # nothing to show (the perception host has the window)
+        else:
+            # The webcam first: if it cannot be opened, no pool processes or shared memory are left behind
+            self.cap, self.grabber = open_webcam(cfg)
+            # Start loading the emotion model now: pool processes, or the preloader (see
+            # parallel_model_load), load it alongside the rest of start-up
+            self.worker, self.preloader = build_worker(cfg, self.startup)
+            if self.preloader is None:
+                self.pool = self.worker
+            # The preview window is drawn on its own thread at preview_fps
+            if cfg.headless:
+                self.preview = HeadlessPreview()
+            else:
+                self.preview = PreviewRenderer(WINDOW, fps=cfg.preview_fps, perf=self.perf)
+        self.preview.start()
+        self.startup.mark("webcam")
+
+        from controller import Robot   # Webots; imported here so tools can load lumo.core without it
+        self.robot = Robot()
+        print("[INFO] Webots Robot node initialized.")
+        self.startup.mark("robot")
+
+        # Motors and LEDs are written through the bus: changed values only, once per step
+        self.recorder = None
+        if cfg.record_dir:
+            self.recorder = SessionRecorder(
+                SessionRecorder.new_session(cfg.record_dir), frame_every=cfg.record_frame_every,
+                frame_scale=cfg.record_frame_scale, jpeg_quality=cfg.record_jpeg_quality,
+                meta={"profile": self.profile.name, "backend": cfg.emotion_backend,
+                      "time_step": cfg.time_step, "display": [cfg.display_w, cfg.display_h]})
+            self.recorder.start()
+        self.bus = ActuatorBus(listener=self.recorder.command if self.recorder else None)
+        self.leds = LedBank(self.device)
+        self.leds.off()
+        self.led_animations = compile_animations(cfg.led_patterns, cfg.led_colors, cfg.time_step)
+        self.profile.setup(self)
+        self.sequencer = MotionSequencer(self.profile.joints, cfg.time_step, rest_pose=self.profile.rest_pose)
+        self.scheduler = BehaviorScheduler(on_done=self._behavior_done)
+        self.startup.mark("devices")
+
+        if self.driver is not None:
+            self.speech = SilentSpeech()   # spoken lines would hold behaviors for wall-clock seconds
+        else:
+            self.speech = SpeechService(rate=cfg.speech_rate, cache_dir=cfg.tts_cache_dir)
+        self.speech.start()
+        self.speech.prerender(line
+                              for table in self.profile.lines.values()
+                              for entry in table
+                              for line in ((entry,) if isinstance(entry, str) else entry))
+        self.startup.mark("speech service")
+
+        # Make sure the emotion model is built and warmed up before the first frame
+        if self.source is not None:
+            self.source.wait_ready()
+            self.worker = self.source
+        else:
+            start_worker(self.worker, self.preloader)
+        self.startup.mark("waiting for emotion model")
+        self.startup.report()
+
+        if self.driver is not None:
+            self.emotion_filter = PassThroughFilter(EMOTION_LABELS)
+        else:
+            self.emotion_filter = EmotionFilter(EMOTION_LABELS, window=cfg.emotion_window,
+                                                enter=cfg.emotion_enter, exit=cfg.emotion_exit,
+                                                cooldown=cfg.emotion_cooldown)
+
+    def shutdown(self):
+        print("[INFO] Cleaning up: releasing webcam and closing windows.")
+        # End a behavior that is still playing now, while its tracks can still clean up and log
+        self.scheduler.cancel("shutdown")
+        self.bus.flush()   # its rest pose / LEDs-off commands only go out on a flush (and to the recorder)
+        self.worker.stop()
+        self.speech.stop()
+        self.grabber.stop()
+        if self.cap is not None:
+            self.cap.release()
+        self.preview.stop()
+        if self.recorder is not None:
+            self.recorder.stop()
+        log.close()   # flush what the loop and the threads logged before the summaries below
+        self.perf.close()
+        print(f"[INFO] Actuator commands: {self.bus.sent} sent, {self.bus.skipped} unchanged and skipped.")
+        cache = self.worker.cache
+        if cache is not None:
+            lookups = cache.hits + cache.misses
+            print(f"[INFO] Emotion cache: {cache.hits} hits, {cache.misses} misses "
+                  f"({100.0 * cache.hits / max(lookups, 1):.1f}% hit rate), {cache.evictions} evicted, "
+                  f"{len(cache)} entries.")
+        if self.pool is not None:
+            print(f"[INFO] Inference pool: {self.pool.dropped} frames dropped (all workers busy), "
+                  f"{self.pool.discarded} out-of-order results discarded.")
+        print(f"[INFO] Event log: {log.written} records written, {log.dropped} dropped (queue full).")
+        if self.driver is not None:
+            self.driver.report()
+        if self.recorder is not None:
+            print(f"[INFO] Session recorded to {self.recorder.path} ({self.recorder.dropped} records dropped).")
+
+    # Helpers -----------------------------------------------------------------
+
+    def device(self, name: str):
+        """A Webots Motor/LED by name, with its set* calls batched through the actuator bus."""
+        return self.bus.wrap(self.robot.getDevice(name), name)
+
+    def step(self) -> int:
+        """Send this step's changed actuator commands, then advance the simulation."""
+        self.bus.flush()
+        return self.robot.step(self.config.time_step)
+
+    def speak(self, text: str):
+        """Queue text for the PC speaker; returns immediately."""
+        log.info("TTS", text)
+        self.speech.say(text)
+
+    def motion_track(self, gesture: Union[Gesture, Trajectory]) -> Track:
+        """Track: play gesture on the sequencer; if interrupted, the moved joints go back to rest."""
+        sequencer = self.sequencer
+        sequencer.play(gesture)
+        try:
+            while sequencer.tick():
+                yield
+        finally:
+            sequencer.cancel(to_rest=True)   # no-op once the gesture has finished
+
+    def speech_track(self, lines: Sequence[str], hold: Callable[[], bool]) -> Track:
+        """Track: speak lines and run until all queued speech is done and hold() is False."""
+        for line in lines:
+            self.speak(line)
+        try:
+            while self.speech.busy or hold():
+                yield
+        finally:
+            self.speech.clear()   # drop lines an interrupted behavior did not get to
+
+    def led_track(self, reaction: str, hold: Callable[[], bool]) -> Track:
+        """Track: the reaction's LED colour and animation while hold() is True, then LEDs off."""
+        action, color = _ANNOUNCE[reaction]
+        log.info("LED", f"{action}: setting LEDs → {color}", reaction=reaction)
+        self.leds.set(self.config.led_colors[reaction])
+        animation = self.led_animations.get(reaction)
+        if animation:
+            self.leds.animate(animation)
+        try:
+            while hold():
+                yield
+        finally:
+            log.info("LED", f"{action}: turning LEDs OFF", reaction=reaction)
+            self.leds.off()
+
+    def neutral(self):
+        """Motors and LEDs back to neutral."""
+        self.profile.neutral()
+        self.leds.off()
+
+    def react(self, reaction: str):
+        """Start the profile's behavior for reaction unless it is already playing."""
+        current = self.scheduler.current
+        if current is not None and current.name == reaction:
+            return
+        self.scheduler.start(self.profile.behavior(reaction))
+
+    def _behavior_done(self, behavior: Behavior, interrupted: bool):
+        seconds = behavior.steps * self.config.time_step / 1000.0
+        self.perf.add("sequence", seconds)
+        if log.recording:
+            log.record("behavior", name=behavior.name, sim=self.robot.getTime(), seconds=seconds,
+                       interrupted=interrupted)
+        if self.driver is not None:
+            self.driver.behavior_done(behavior.name, seconds, interrupted)
+
+    # Main loop ---------------------------------------------------------------
+
+    def loop(self):
+        robot, perf, scheduler, worker, recorder = self.robot, self.perf, self.scheduler, self.worker, self.recorder
+        last_frame_seq = -1
+        last_face_time = 0.0
+
+        if not (self.config.headless or self.source is not None):
+            print(f"[INFO] Entering main control loop. Press ESC in the '{WINDOW}' window to exit.")
+        else:
+            print("[INFO] Entering main control loop.")
+        while self.step() != -1:
+            perf.tick(robot.getTime())
+            if recorder is not None:
+                recorder.sim = robot.getTime()   # stamps the commands flushed at the next step()
+
+            # Advance the running behavior's tracks and the LED animations by one control step
+            scheduler.tick()
+            perf.lap("behavior")
+            self.leds.tick()
+            perf.lap("leds")
+            # A synthetic emotion script ends the run once it and its last behavior have played out
+            if self.driver is not None and self.driver.done and not scheduler.active:
+                break
+
+            # Grab the newest webcam frame (a view into the grabber's ring buffer)
+            frame_seq, frame = self.grabber.latest()
+            perf.lap("capture")
+            if self.preview.closed:
+                log.info("INFO", "ESC pressed. Exiting controller.")
+                break
+            if frame is None:
+                log.warn("WARN", "Frame read failed. Keeping joints & LEDs neutral.")
+                # Reset everything to neutral once the current behavior has finished
+                if not scheduler.active:
+                    self.neutral()
+                continue
+
+            # Hand new frames to the inference worker; never wait for the model
+            if frame_seq != last_frame_seq:
+                if log.debugging:
+                    log.debug("DEBUG", f"Frame {frame_seq} acquired from webcam.", frame=frame_seq)
+                seq = worker.submit(frame)
+                if recorder is not None:
+                    recorder.frame(seq, frame, robot.getTime())
+                last_frame_seq = frame_seq
+            perf.lap("resize")
+            result = worker.poll()
+            cancelled = False
+            if result is not None:
+                perf.add("inference", result.inference_s)
+                perf.add("latency", result.latency_s)
+                perf.count("faces_classified", result.classified)
+                perf.count("faces_reused", result.reused)
+                perf.count("cache_hits", result.cache_hits)
+                perf.count("cache_misses", result.cache_misses)
+                if log.recording:
+                    log.record("emotion", frame=result.seq, sim=robot.getTime(), emotion=result.dominant_emotion,
+                               probs=result.probs, faces=len(result.faces), target=result.target,
+                               latency_ms=round(result.latency_s * 1e3, 2))
+                if recorder is not None:
+                    recorder.emotion(result.seq, robot.getTime(), result.probs, len(result.faces), result.target,
+                                     result.latency_s)
+                # The user left: stop reacting to them instead of finishing the behavior
+                if result.faces:
+                    last_face_time = robot.getTime()
+                elif (self.config.user_lost_after is not None and scheduler.active
+                      and robot.getTime() - last_face_time >= self.config.user_lost_after):
+                    scheduler.cancel("no face in view")
+                    cancelled = True
+
+            # Hand the frame and the latest result to the preview (drawn on its own thread)
+            self.preview.show(frame_seq, frame, worker.latest())
+            perf.lap("display")
+
+            # Only react once per fresh result; the worker may still be busy.
+            if result is None:
+                continue
+
+            # React only to confident, stable emotions (see the emotion_* settings)
+            triggered = self.emotion_filter.update(result.probs)
+            reaction = REACTIONS.get(triggered)
+            if reaction is not None:
+                log.info("ACTION", f"Detected: {_ANNOUNCE[reaction][0]}",
+                         frame=result.seq, sim=robot.getTime(), action=reaction, probs=result.probs)
+                self.react(reaction)
+            else:
+                # Nothing new to react to ⇒ keep everything neutral
+                if self.emotion_filter.current is None:
+                    if log.debugging:
+                        log.debug("INFO", "No stable emotion detected.", frame=result.seq)
+                elif triggered is not None:
+                    log.info("INFO", f"Emotion '{triggered}' not handled; resetting posture & LEDs.",
+                             frame=result.seq, sim=robot.getTime(), emotion=triggered)
+                # Let a running behavior finish; it returns to neutral on its own. A behavior
+                # cancelled this step has just sent its joints to rest, which neutral() must not overwrite.
+                if not scheduler.active and not cancelled:
+                    self.neutral()
+            perf.lap("dispatch")
@@ -0,0 +1,157 @@
+# lumo/events.py
+#
+# Structured, buffered event log for what happens while the loop runs:
+# per-frame debug output, reactions, speech, LED and behavior changes. A call
+# only builds a small tuple and puts it on a bounded in-memory queue. A
+# background thread then echoes records at or above the console level as the
+# usual "[TAG] message" lines, and appends every record to a JSONL file when
+# one is configured. If the queue is full, records are dropped and counted;
+# the control loop never waits on stdout or the disk.
+#
+# The debug channel is sampled: with debug_every = N only every N-th debug
+# record is kept, and 0 turns it off. Hot paths test log.debugging (or
+# log.recording for data-only records) before building any arguments, so a
+# disabled channel costs one attribute read.
+
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEBUG, INFO, WARN, ERROR = 10, 20, 30, 40
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARN": WARN, "ERROR": ERROR}
+_NAMES = {level: name for name, level in LEVELS.items()}
+_STOP = None
+
+
+def _jsonable(value: Any):
+    return value.tolist() if hasattr(value, "tolist") else str(value)   # NumPy arrays and scalars
+
+
+class EventLog:
+    """
+    Leveled event log with a background writer thread (started on first use).
+
+    configure() sets the JSONL path, the console level and debug sampling;
+    everything in lumo logs through the module-level `log` instance.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.console_level = INFO
+        self.debug_every = 0
+        self.debugging = False      # debug channel on?
+        self.recording = False      # JSONL file open?
+        self.written = 0
+        self.dropped = 0
+        self._debug_seen = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=capacity)
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False        # after close(): no writer thread, console output is written directly
+
+    def configure(self, path: Optional[str] = None, console_level: str = "INFO", debug_every: int = 0):
+        """(Re)open the outputs: JSONL file (None: console only), console level name, debug sampling."""
+        self.close()
+        self._closed = False
+        self.console_level = LEVELS[console_level.upper()]
+        self.debug_every = max(0, int(debug_every))
+        self.debugging = self.debug_every > 0
+        self._debug_seen = 0
+        if path:
+            self._file = open(path, "a", encoding="utf-8")
+        self.recording = self._file is not None
+
+    def debug(self, tag: str, message: str, **fields):
+        """Sampled debug record; check `debugging` first on hot paths."""
+        if not self.debugging:
+            return
+        self._debug_seen += 1
+        if self._debug_seen % self.debug_every:
+            return
+        self._put(DEBUG, tag, message, fields)
+
+    def info(self, tag: str, message: str, **fields):
+        self._put(INFO, tag, message, fields)
+
+    def warn(self, tag: str, message: str, **fields):
+        self._put(WARN, tag, message, fields)
+
+    def error(self, tag: str, message: str, **fields):
+        self._put(ERROR, tag, message, fields)
+
+    def record(self, kind: str, **fields):
+        """Data-only record for the JSONL file (never echoed), e.g. one per analysed frame."""
+        if self.recording:
+            self._put(INFO, kind, None, fields)
+
+    def close(self):
+        """Write out everything queued, stop the writer thread and close the file."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._closed = True
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.recording = False
+
+    def _put(self, level: int, tag: str, message: Optional[str], fields: Dict[str, Any]):
+        if self._file is None and (message is None or level < self.console_level):
+            return
+        if self._closed:
+            # Late records (e.g. generator cleanup at interpreter exit) must not start a new thread
+            if message is not None and level >= self.console_level:
+                sys.stdout.write(f"[{tag}] {message}\n")
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((time.time(), level, tag, message, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="EventLog", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            console, lines = [], []
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                    continue
+                t, level, tag, message, fields = item
+                self.written += 1
+                if message is not None and level >= self.console_level:
+                    console.append(f"[{tag}] {message}\n")
+                if self._file is not None:
+                    entry = {"t": round(t, 6), "level": _NAMES[level], "tag": tag}
+                    if message is not None:
+                        entry["msg"] = message
+                    entry.update(fields)
+                    lines.append(json.dumps(entry, default=_jsonable) + "\n")
+            if console:
+                sys.stdout.write("".join(console))
+                sys.stdout.flush()
+            if lines:
+                self._file.write("".join(lines))
+
+
+log = EventLog()
+atexit.register(log.close)
@@ -0,0 +1,109 @@
+# lumo/faces.py
+#
+# Cheap face front stage for the emotion model. A detector (a Haar cascade by
+# default) finds the faces once; afterwards each face ROI is followed by
+# template matching in a small search window, and the detector only runs again
+# when tracking is lost (or periodically, to pick up newcomers). Frames
+# without a face never reach the (expensive) emotion classifier.
+
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Box = Tuple[int, int, int, int]   # x, y, w, h in frame pixels
+
+HAAR_CASCADE = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+
+
+class HaarDetector:
+    """OpenCV's frontal-face Haar cascade; call it with a BGR frame."""
+
+    def __init__(self, min_size: int = 20):
+        self.cascade = cv2.CascadeClassifier(HAAR_CASCADE)
+        if self.cascade.empty():
+            raise RuntimeError(f"Cannot load Haar cascade from {HAAR_CASCADE}")
+        self.min_size = min_size
+
+    def __call__(self, frame: np.ndarray) -> List[Box]:
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = self.cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                              minSize=(self.min_size, self.min_size))
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class FaceTracker:
+    """
+    Detect-then-track up to max_faces faces.
+
+    update(frame) returns the face boxes, largest first, or an empty list when
+    nobody is in view. detector is any callable mapping a BGR frame to a list
+    of boxes (a Haar cascade by default, or an EmotionBackend's detect).
+    min_score is the normalised template-matching score below which a track
+    counts as lost; search is how far (as a fraction of the box size) a face
+    may move between two analysed frames. Detection runs again as soon as any
+    track is lost, and every redetect_every frames so newcomers are picked up.
+    """
+
+    def __init__(self, detector: Optional[Callable[[np.ndarray], List[Box]]] = None,
+                 min_score: float = 0.6, search: float = 0.5,
+                 max_faces: int = 4, redetect_every: int = 30):
+        self.detector = detector or HaarDetector()
+        self.min_score = min_score
+        self.search = search
+        self.max_faces = max_faces
+        self.redetect_every = redetect_every
+        self.boxes: List[Box] = []
+        self._templates: List[np.ndarray] = []
+        self._since_detect = 0
+        self.detections = 0       # full detector runs, for tuning
+        self.tracked = 0          # frames served by the tracker alone
+
+    def reset(self):
+        """Forget all tracks; the next update() runs full detection."""
+        self.boxes = []
+        self._templates = []
+
+    def update(self, frame: np.ndarray) -> List[Box]:
+        """Return the face boxes in frame (BGR); empty if there is no face."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self._templates and self._since_detect < self.redetect_every:
+            boxes = [self._track(gray, box, template)
+                     for box, template in zip(self.boxes, self._templates)]
+            if all(box is not None for box in boxes):
+                self.boxes = boxes
+                self._since_detect += 1
+                self.tracked += 1
+                return self.boxes
+        return self._detect(frame, gray)
+
+    def _detect(self, frame: np.ndarray, gray: np.ndarray) -> List[Box]:
+        self.detections += 1
+        self._since_detect = 0
+        faces = sorted(self.detector(frame), key=lambda f: f[2] * f[3], reverse=True)
+        self.boxes = [tuple(face) for face in faces[:self.max_faces]]
+        self._templates = [gray[y:y + h, x:x + w].copy() for x, y, w, h in self.boxes]
+        return self.boxes
+
+    def _track(self, gray: np.ndarray, box: Box, template: np.ndarray) -> Optional[Box]:
+        x, y, w, h = box
+        dx, dy = int(w * self.search), int(h * self.search)
+        x0, y0 = max(0, x - dx), max(0, y - dy)
+        x1, y1 = min(gray.shape[1], x + w + dx), min(gray.shape[0], y + h + dy)
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < h or window.shape[1] < w:
+            return None
+        scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (bx, by) = cv2.minMaxLoc(scores)
+        if best < self.min_score:
+            return None
+        return (x0 + bx, y0 + by, w, h)
+
+
+def crop_face(frame: np.ndarray, box: Box, margin: float = 0.15) -> np.ndarray:
+    """Return the face ROI widened by margin on each side (a view, not a copy)."""
+    x, y, w, h = box
+    mx, my = int(w * margin), int(h * margin)
+    x0, y0 = max(0, x - mx), max(0, y - my)
+    x1, y1 = min(frame.shape[1], x + w + mx), min(frame.shape[0], y + h + my)
+    return frame[y0:y1, x0:x1]
@@ -0,0 +1,129 @@
+# lumo/gestures.py
+#
+# Gesture library loaded from a data file instead of code. The file (JSON, or
+# YAML when PyYAML is installed) declares joint groups, a rest pose and any
+# number of gestures as keyframes over joint names; load_library() compiles
+# every gesture once, at startup, into a motion.Trajectory over one shared
+# joint order. Adding a gesture means editing the file, not the controller.
+#
+# File layout:
+#
+#   {
+#     "groups":    {"hands": ["RPhalanx1", ...]},
+#     "rest":      {"velocity": 1.0, "targets": {"HeadYaw": 0.0, "hands": [0.0, null]}},
+#     "reactions": {"happy": ["happy", "wave"]},
+#     "gestures":  {
+#       "wave": [
+#         {"actions": ["say:0"]},
+#         {"velocity": 1.5, "targets": {"RShoulderPitch": -1.0}, "hold_ms": 1500},
+#         {"repeat": 2, "keyframes": [...]},
+#         {"actions": ["say:1"], "wait_for": "speaking"}
+#       ]
+#     }
+#   }
+#
+# "reactions" maps a reaction to the gestures it may play (one is picked at
+# random each time); a reaction it does not list plays the gesture of the
+# same name, if there is one, and a reaction with neither plays no motion.
+#
+# A target is a position (moved at the keyframe's "velocity", or at the
+# current velocity when that is absent/null) or a [position, velocity] pair;
+# a group name targets all of its joints. Actions and wait_for are names that
+# the behavior profile binds to callables when the gesture is played; LEDs
+# are not part of the file, they run on their own track (lumo.behavior).
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple, Union
+
+from lumo.motion import Gesture, Keyframe, Targets, Trajectory, compile_gesture
+
+
+@dataclass
+class GestureLibrary:
+    """Compiled gestures sharing one joint order, the rest pose, joint groups and reaction -> gestures."""
+    joints: Tuple[str, ...]
+    rest_pose: Targets
+    groups: Dict[str, List[str]]
+    gestures: Dict[str, Trajectory]
+    reactions: Dict[str, Tuple[str, ...]]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.gestures
+
+    def __getitem__(self, name: str) -> Trajectory:
+        return self.gestures[name]
+
+
+def read_file(path: str) -> dict:
+    """Parse a gesture file (.json, or .yaml/.yml with PyYAML)."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError(f"PyYAML is needed to read {path} (pip install pyyaml)")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def load_library(path: str, time_step: int) -> GestureLibrary:
+    """Load and compile every gesture in path for time_step [ms]."""
+    data = read_file(path)
+    groups: Dict[str, List[str]] = data.get("groups", {})
+    rest = _targets(data.get("rest", {}), groups)
+    gestures = {name: Gesture(name, _keyframes(frames, groups))
+                for name, frames in data.get("gestures", {}).items()}
+    reactions = _reactions(data.get("reactions", {}), gestures, path)
+
+    joints: List[str] = list(rest)
+    for gesture in gestures.values():
+        for kf in gesture.keyframes:
+            joints.extend(kf.targets)
+    joints = tuple(dict.fromkeys(joints))
+
+    library = GestureLibrary(joints, rest, groups, {name: compile_gesture(gesture, joints, time_step)
+                                                    for name, gesture in gestures.items()}, reactions)
+    print(f"[INFO] Loaded {len(library.gestures)} gestures over {len(joints)} joints "
+          f"from {os.path.basename(path)}.")
+    return library
+
+
+def _reactions(table: Dict[str, Union[str, Sequence[str]]], gestures: Dict[str, Gesture],
+               path: str) -> Dict[str, Tuple[str, ...]]:
+    reactions = {name: (name,) for name in gestures}
+    for reaction, names in table.items():
+        names = (names,) if isinstance(names, str) else tuple(names)
+        for name in names:
+            if name not in gestures:
+                raise ValueError(f"Reaction '{reaction}' in {path} names unknown gesture '{name}'")
+        reactions[reaction] = names
+    return reactions
+
+
+def _keyframes(frames: Sequence[dict], groups: Dict[str, List[str]]) -> List[Keyframe]:
+    keyframes = []
+    for frame in frames:
+        if "repeat" in frame:
+            inner = _keyframes(frame["keyframes"], groups)
+            keyframes.extend(inner * int(frame["repeat"]))
+            continue
+        keyframes.append(Keyframe(targets=_targets(frame, groups),
+                                  hold_ms=int(frame.get("hold_ms", 0)),
+                                  actions=list(frame.get("actions", [])),
+                                  wait_for=frame.get("wait_for")))
+    return keyframes
+
+
+def _targets(frame: dict, groups: Dict[str, List[str]]) -> Targets:
+    default_velocity = frame.get("velocity")
+    targets: Targets = {}
+    for name, value in frame.get("targets", {}).items():
+        if isinstance(value, (list, tuple)):
+            position, velocity = value
+        else:
+            position, velocity = value, default_velocity
+        for joint in groups.get(name, [name]):
+            targets[joint] = (float(position), None if velocity is None else float(velocity))
+    return targets
@@ -0,0 +1,337 @@
+# lumo/inference.py
+#
+# Background emotion inference, so the Webots control loop never blocks on
+# the emotion model. The loop hands the newest frame to the worker and only
+# reads back whatever result the worker last published. A FaceTracker gates
+# the model: frames without a face are never classified, and only the face
+# crops are. All faces in a frame go through the model as one batch; a target
+# policy then picks the face Lumo reacts to. A ChangeGate skips the model for
+# faces that have not visibly changed since they were last classified, and an
+# EmotionCache answers faces that look like one classified earlier.
+#
+# The model itself comes from an EmotionBackend (lumo.backends). Its heavy
+# imports happen in backend.load(), which a ModelPreloader thread can run
+# while the webcam and robot are still being set up.
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from lumo.backends import ANALYSIS_H, ANALYSIS_W, EMOTION_LABELS, EmotionBackend
+from lumo.cache import EmotionCache, signature
+from lumo.events import log
+from lumo.faces import FaceTracker, crop_face
+from lumo.startup import StartupTimer
+
+# Change gate defaults: a face whose grayscale thumbnail differs from the one
+# last classified by less than SKIP_THRESHOLD (mean absolute difference,
+# 0..255) reuses that emotion vector, for at most SKIP_MAX_STALE analysed
+# frames in a row.
+SKIP_THRESHOLD = 4.0
+SKIP_MAX_STALE = 10
+_THUMB_SIZE = 16
+
+
+class ModelPreloader(threading.Thread):
+    """Runs backend.load() on a background thread; wait() joins it."""
+
+    def __init__(self, backend: EmotionBackend, timer: Optional[StartupTimer] = None):
+        super().__init__(name="ModelPreloader", daemon=True)
+        self.backend = backend
+        self.timer = timer
+        self.error: Optional[Exception] = None
+
+    def run(self):
+        try:
+            self.backend.load(self.timer, background=True)
+        except Exception as e:
+            self.error = e
+
+    def wait(self):
+        """Block until the model is ready; loading errors are reported, not raised."""
+        self.join()
+        if self.error is not None:
+            print(f"[WARN] Emotion model preload failed: {self.error}. Will retry on first frame.")
+
+
+@dataclass
+class FaceResult:
+    """Emotion estimate for one face in an analysed frame."""
+    box: tuple                                # (x, y, w, h) in the analysis frame
+    probs: np.ndarray                         # per-class probabilities, EMOTION_LABELS order
+    dominant_emotion: str
+
+
+@dataclass
+class EmotionResult:
+    """
+    One published inference result. faces holds every face in the frame;
+    the top-level fields describe faces[target], the face Lumo reacts to.
+    """
+    seq: int                                  # number of the analysed frame
+    dominant_emotion: Optional[str] = None    # None if nothing was detected
+    emotions: dict = field(default_factory=dict)
+    face_box: Optional[tuple] = None          # (x, y, w, h) in the analysis frame
+    probs: Optional[np.ndarray] = None        # per-class probabilities, EMOTION_LABELS order
+    timestamp: float = 0.0                    # time.monotonic() when published
+    faces: List[FaceResult] = field(default_factory=list)
+    target: Optional[int] = None              # index into faces
+    reused: int = 0                           # faces whose emotion vector was reused (ChangeGate)
+    cache_hits: int = 0                       # faces answered from the EmotionCache
+    cache_misses: int = 0                     # faces looked up in the cache and not found
+    classified: int = 0                       # faces that went through the model
+    inference_s: float = 0.0                  # time spent detecting + classifying
+    latency_s: float = 0.0                    # submit() to publication, incl. queueing
+
+
+TARGET_POLICIES = ("largest", "center", "confident")
+
+
+def select_target(faces: Sequence[FaceResult], policy: str, frame_shape: Tuple[int, ...]) -> Optional[int]:
+    """
+    Pick the face to react to: the largest box, the box closest to the frame
+    centre, or the face whose dominant emotion is the most confident.
+    """
+    if not faces:
+        return None
+    if policy == "largest":
+        key = lambda f: -f.box[2] * f.box[3]
+    elif policy == "center":
+        cx, cy = frame_shape[1] / 2.0, frame_shape[0] / 2.0
+        key = lambda f: (f.box[0] + f.box[2] / 2.0 - cx) ** 2 + (f.box[1] + f.box[3] / 2.0 - cy) ** 2
+    elif policy == "confident":
+        key = lambda f: -float(np.max(f.probs))
+    else:
+        raise ValueError(f"Unknown target policy '{policy}' (choose from {', '.join(TARGET_POLICIES)})")
+    return min(range(len(faces)), key=lambda i: key(faces[i]))
+
+
+@dataclass
+class _Classified:
+    box: tuple
+    thumb: np.ndarray        # grayscale thumbnail of the crop the model last saw
+    probs: np.ndarray
+    stale: int               # analysed frames since the model last ran on this face
+
+
+class ChangeGate:
+    """
+    Decides per face whether the emotion model has to run again.
+
+    Each face is matched to the nearest face of the previous frame. The
+    match's emotion vector is reused while the crop's 16x16 grayscale
+    thumbnail stays within threshold of the thumbnail last classified, for
+    up to max_stale frames. Comparing against the last classified crop, not
+    the previous frame, means slow drift still triggers a refresh. After
+    reusable(), refresh holds the boxes that are unchanged but due for a
+    refresh; those should go to the model, not to a cache.
+    """
+
+    def __init__(self, threshold: float = SKIP_THRESHOLD, max_stale: int = SKIP_MAX_STALE):
+        self.threshold = threshold
+        self.max_stale = max_stale
+        self.reused = 0
+        self.classified = 0
+        self.refresh: List[int] = []
+        self._faces: List[_Classified] = []
+        self._matches: List[Tuple[Optional[_Classified], np.ndarray]] = []
+
+    def reusable(self, small: np.ndarray, boxes: Sequence[tuple]) -> List[Optional[np.ndarray]]:
+        """Per box, the emotion vector that can be reused, or None if the model must run."""
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        free = list(self._faces)
+        self._matches = []
+        self.refresh = []
+        reuse: List[Optional[np.ndarray]] = []
+        for i, box in enumerate(boxes):
+            thumb = cv2.resize(crop_face(gray, box), (_THUMB_SIZE, _THUMB_SIZE),
+                               interpolation=cv2.INTER_AREA).astype(np.int16)
+            match = _nearest(box, free)
+            if match is not None:
+                free.remove(match)
+            if match is not None and np.abs(thumb - match.thumb).mean() >= self.threshold:
+                match = None
+            if match is not None and match.stale >= self.max_stale:
+                self.refresh.append(i)
+                match = None
+            reuse.append(None if match is None else match.probs)
+            self._matches.append((match, thumb))
+        return reuse
+
+    def record(self, boxes: Sequence[tuple], probs: Sequence[np.ndarray]):
+        """Remember this frame's faces; call after reusable() with every face's final vector."""
+        faces = []
+        for box, p, (match, thumb) in zip(boxes, probs, self._matches):
+            if match is not None:
+                faces.append(_Classified(box, match.thumb, match.probs, match.stale + 1))
+                self.reused += 1
+            else:
+                faces.append(_Classified(box, thumb, p, 0))
+                self.classified += 1
+        self._faces = faces
+
+    def reset(self):
+        self._faces = []
+
+
+def _nearest(box: tuple, faces: Sequence[_Classified]) -> Optional[_Classified]:
+    """The face whose box centre is closest to box's, if within half the box size."""
+    x, y, w, h = box
+    cx, cy, best, best_d = x + w / 2, y + h / 2, None, max(w, h) / 2
+    for face in faces:
+        fx, fy, fw, fh = face.box
+        d = max(abs(fx + fw / 2 - cx), abs(fy + fh / 2 - cy))
+        if d <= best_d:
+            best, best_d = face, d
+    return best
+
+
+class EmotionWorker:
+    """
+    Runs the emotion backend on its own thread.
+
+    submit() stores the newest frame and returns immediately; a frame that
+    arrives while the model is busy replaces the pending one, so a slow model
+    never builds a backlog. poll() returns a result once, the first time it is
+    seen, and latest() returns the last published result. policy is one of
+    TARGET_POLICIES and decides which face the result's top-level fields use.
+    gate skips unchanged faces and cache answers previously seen ones (None:
+    classify every face of every frame).
+    """
+
+    def __init__(self, backend: EmotionBackend, tracker: Optional[FaceTracker] = None,
+                 policy: str = "largest", gate: Optional[ChangeGate] = None,
+                 cache: Optional[EmotionCache] = None):
+        if policy not in TARGET_POLICIES:
+            raise ValueError(f"Unknown target policy '{policy}' (choose from {', '.join(TARGET_POLICIES)})")
+        self.backend = backend
+        self.tracker = tracker or FaceTracker(detector=backend.detect)
+        self.policy = policy
+        self.gate = gate
+        self.cache = cache
+        self._cond = threading.Condition()
+        self._pending = None
+        self._pending_seq = 0
+        self._pending_t = 0.0
+        self._result: Optional[EmotionResult] = None
+        self._polled_seq = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the background thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="EmotionWorker", daemon=True)
+        self._thread.start()
+        print("[INFO] Emotion inference worker started.")
+
+    def stop(self, timeout: float = 2.0):
+        """Ask the background thread to finish and wait for it."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, frame) -> Optional[int]:
+        """Offer a BGR frame for analysis; never waits for the model. Returns its result's seq."""
+        submitted = time.perf_counter()
+        small = cv2.resize(frame, (ANALYSIS_W, ANALYSIS_H))
+        with self._cond:
+            self._pending = small
+            self._pending_seq += 1
+            self._pending_t = submitted
+            self._cond.notify()
+            return self._pending_seq
+
+    def poll(self) -> Optional[EmotionResult]:
+        """Return the latest result if it has not been returned before, else None."""
+        result = self._result
+        if result is None or result.seq == self._polled_seq:
+            return None
+        self._polled_seq = result.seq
+        return result
+
+    def latest(self) -> Optional[EmotionResult]:
+        """Return the last published result (may be None before the first one)."""
+        return self._result
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                small, seq, submitted = self._pending, self._pending_seq, self._pending_t
+                self._pending = None
+            started = time.perf_counter()
+            result = self._analyze(small, seq)
+            done = time.perf_counter()
+            result.inference_s = done - started
+            result.latency_s = done - submitted
+            self._result = result
+
+    def _analyze(self, small, seq: int) -> EmotionResult:
+        result = EmotionResult(seq=seq)
+        gate = self.gate
+        try:
+            boxes = self.tracker.update(small)
+        except Exception as e:
+            # A detector failure must not end the worker thread (or pool process) silently
+            log.warn("WARN", f"Face detection error: {e}. No emotion detected.", frame=seq)
+            if gate is not None:
+                gate.reset()
+            result.timestamp = time.monotonic()
+            return result
+        if not boxes:
+            if log.debugging:
+                log.debug("DEBUG", "No face in view; skipping emotion model.", frame=seq)
+            if gate is not None:
+                gate.reset()
+            result.timestamp = time.monotonic()
+            return result
+        try:
+            probs = gate.reusable(small, boxes) if gate is not None else [None] * len(boxes)
+            todo = [i for i, p in enumerate(probs) if p is None]
+            result.reused = len(boxes) - len(todo)
+            crops = {i: crop_face(small, boxes[i]) for i in todo}
+            keys = {}
+            if self.cache is not None:
+                refresh = gate.refresh if gate is not None else ()
+                for i in todo:
+                    keys[i] = signature(crops[i])
+                    if i not in refresh:
+                        probs[i] = self.cache.get(keys[i])
+                        result.cache_misses += probs[i] is None
+                todo = [i for i in todo if probs[i] is None]
+                result.cache_hits = len(crops) - len(todo)
+            if todo:
+                for i, p in zip(todo, self.backend.classify([crops[i] for i in todo])):
+                    probs[i] = p
+                    if self.cache is not None:
+                        self.cache.put(keys[i], p)
+            result.classified = len(todo)
+            if gate is not None:
+                gate.record(boxes, probs)
+            result.faces = [FaceResult(box, p, EMOTION_LABELS[int(np.argmax(p))])
+                            for box, p in zip(boxes, probs)]
+            result.target = select_target(result.faces, self.policy, small.shape)
+            target = result.faces[result.target]
+            result.face_box = target.box
+            result.probs = target.probs
+            result.emotions = {label: float(p) * 100.0 for label, p in zip(EMOTION_LABELS, target.probs)}
+            result.dominant_emotion = target.dominant_emotion
+            if log.debugging:
+                log.debug("DEBUG", f"Extracted dominant_emotion: {result.dominant_emotion} "
+                                   f"(face {result.target + 1} of {len(result.faces)}; "
+                                   f"{result.classified} classified, {result.reused} reused, "
+                                   f"{result.cache_hits} cached)", frame=seq)
+        except Exception as e:
+            log.warn("WARN", f"Emotion analysis error: {e}. No emotion detected.", frame=seq)
+        result.timestamp = time.monotonic()
+        return result
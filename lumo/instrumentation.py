@@ -0,0 +1,192 @@
+# lumo/instrumentation.py
+#
+# Low-overhead timing for the controller loop. Each iteration is split into
+# named stages (capture, resize, display, dispatch, ...) by calling
+# lap() after each one; work timed elsewhere (model inference on the worker
+# thread, whole gestures) is fed in with add(). Every sample lands in a
+# fixed log-scale histogram, so memory stays constant however long Webots
+# runs. The loop rate and the drift between simulation and wall time are
+# tracked from tick(), a summary is printed every few seconds, and every
+# iteration can optionally be written to a CSV or JSONL file.
+
+import bisect
+import csv
+import json
+import math
+import time
+from typing import Dict, List, Optional, Sequence
+
+# Stages the controllers record, in report order.
+#   loop      whole iteration, tick() to tick()
+#   step      robot.step() plus anything after the iteration's last lap()
+#   inference / latency   model time / submit-to-result time on the worker
+#   behavior  stepping the running behavior's motion, speech and LED tracks
+#   sequence  length of each played behavior (simulation time)
+STAGES = ("loop", "step", "behavior", "leds", "capture", "resize", "inference", "latency", "display",
+          "dispatch", "sequence")
+
+
+class Histogram:
+    """
+    Log-scale histogram of durations in seconds (1 us .. 100 s, 10 buckets
+    per decade). Percentiles are accurate to about 12%.
+    """
+
+    _EDGES = [10.0 ** (e / 10.0) for e in range(-60, 21)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self._EDGES) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.counts[bisect.bisect_left(self._EDGES, seconds)] += 1
+        self.n += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Upper edge of the bucket holding the q-th percentile (0..100)."""
+        if not self.n:
+            return 0.0
+        rank = math.ceil(self.n * q / 100.0)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._EDGES[min(i, len(self._EDGES) - 1)], self.max)
+        return self.max
+
+
+class LoopInstruments:
+    """
+    Per-iteration stage timings for a Webots control loop.
+
+    Call tick(robot.getTime()) right after robot.step() at the top of every
+    iteration, and lap(stage) after each stage; a `continue` simply leaves
+    the remaining stages unrecorded for that iteration. summary_every is the
+    wall-time period (s) of the printed summary, None to only summarise in
+    close(); dump_path writes one row per iteration (.csv, else JSONL).
+    """
+
+    def __init__(self, time_step: int, stages: Sequence[str] = STAGES,
+                 summary_every: Optional[float] = 10.0, dump_path: Optional[str] = None):
+        self.time_step = time_step
+        self.stages = tuple(stages)
+        self.summary_every = summary_every
+        self.histograms: Dict[str, Histogram] = {name: Histogram() for name in self.stages}
+        self.counters: Dict[str, int] = {}
+        self.iterations = 0
+        self._row: Dict[str, float] = {}
+        self._last = None
+        self._loop_start = 0.0
+        self._t0 = None
+        self._sim0 = 0.0
+        self._sim = 0.0
+        self._window = (0.0, 0.0, 0)   # (wall, sim, iterations) at the last summary
+        self._next_summary = None
+        self._rows: List[Dict[str, float]] = []
+        self._file = None
+        self._writer = None
+        if dump_path:
+            self._file = open(dump_path, "w", newline="")
+            if dump_path.endswith(".csv"):
+                self._writer = csv.DictWriter(self._file, ["iteration", "wall", "sim"] + list(self.stages))
+                self._writer.writeheader()
+
+    def tick(self, sim_time: float):
+        """Close the previous iteration and start a new one at simulation time sim_time (s)."""
+        now = time.perf_counter()
+        if self._t0 is None:
+            self._t0 = now
+            self._sim0 = sim_time
+            self._window = (now, sim_time, 0)
+            if self.summary_every:
+                self._next_summary = now + self.summary_every
+        else:
+            self.add("step", now - self._last)
+            self.add("loop", now - self._loop_start)
+            self._flush_row()
+        self.iterations += 1
+        self._sim = sim_time
+        self._loop_start = now
+        self._row = {"iteration": self.iterations, "wall": now - self._t0, "sim": sim_time - self._sim0}
+        self._last = now
+        if self._next_summary is not None and now >= self._next_summary:
+            self._next_summary = now + self.summary_every
+            self.summary()
+
+    def lap(self, stage: str):
+        """Record the time since the previous tick()/lap() as stage."""
+        now = time.perf_counter()
+        if self._last is not None:
+            self.add(stage, now - self._last)
+        self._last = now
+
+    def add(self, stage: str, seconds: float):
+        """Record a duration measured elsewhere (e.g. on the inference thread)."""
+        self.histograms[stage].add(seconds)
+        self._row[stage] = seconds
+
+    def count(self, name: str, n: int = 1):
+        """Add n to the event counter name (e.g. cache hits), reported in every summary."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @property
+    def drift(self) -> float:
+        """Wall time minus simulation time since the first tick (s); > 0 means behind real time."""
+        if self._t0 is None:
+            return 0.0
+        return (time.perf_counter() - self._t0) - (self._sim - self._sim0)
+
+    def summary(self):
+        """Print loop rate, sim/wall drift and per-stage timings."""
+        now = time.perf_counter()
+        wall0, sim0, it0 = self._window
+        wall, sim = now - wall0, self._sim - sim0
+        self._window = (now, self._sim, self.iterations)
+        hz = (self.iterations - it0) / wall if wall > 0 else 0.0
+        speed = sim / wall if wall > 0 else 0.0
+        print(f"[PERF] {hz:5.1f} Hz (target {1000.0 / self.time_step:.1f}), "
+              f"{speed:.2f}x real time, wall - sim drift {self.drift:+.2f}s")
+        print(f"[PERF]   {'stage':<10} {'n':>7} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}  [ms]")
+        for name in self.stages:
+            h = self.histograms[name]
+            if h.n:
+                print(f"[PERF]   {name:<10} {h.n:7d} {h.mean * 1e3:8.2f} {h.percentile(50) * 1e3:8.2f} "
+                      f"{h.percentile(95) * 1e3:8.2f} {h.max * 1e3:8.2f}")
+        if self.counters:
+            print("[PERF]   counts: " + ", ".join(f"{name} {n}" for name, n in self.counters.items()))
+        self._write_rows()
+
+    def close(self):
+        """Print the final summary and close the dump file."""
+        if self._t0 is not None:
+            self._flush_row()
+            self.summary()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _flush_row(self):
+        if self._file is not None:
+            self._rows.append(self._row)
+            if len(self._rows) >= 512:
+                self._write_rows()
+
+    def _write_rows(self):
+        if self._file is None:
+            return
+        for row in self._rows:
+            if self._writer is not None:
+                self._writer.writerow(row)
+            else:
+                self._file.write(json.dumps(row) + "\n")
+        self._rows = []
+        self._file.flush()
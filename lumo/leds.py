@@ -0,0 +1,144 @@
+# lumo/leds.py
+#
+# NAO's RGB LEDs in three groups (face, chest, feet). A group shows either a
+# solid colour or an animation (pulse, fade, breathing). Each animation is
+# precomputed once as an integer 0xRRGGBB table with one entry per control
+# step. tick() moves every running table forward by one index and writes a
+# group only when its colour changes. Animations therefore cost almost nothing
+# per step, and they keep running while Lumo speaks or gestures.
+
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Webots device names of the RGB LEDs Lumo uses, by group.
+LED_GROUPS = {
+    "face":  ("Face/Led/Left", "Face/Led/Right"),
+    "chest": ("ChestBoard/Led",),
+    "feet":  ("LFoot/Led", "RFoot/Led"),
+}
+LED_NAMES = tuple(name for names in LED_GROUPS.values() for name in names)
+
+# pattern -> (loops?, brightness 0..1 as a function of phase 0..1 within one period)
+PATTERNS = {
+    "solid":    (True,  lambda t: np.ones_like(t)),
+    "pulse":    (True,  lambda t: (t < 0.5).astype(float)),
+    "breathe":  (True,  lambda t: 0.15 + 0.85 * (0.5 - 0.5 * np.cos(2.0 * np.pi * t))),
+    "fade_in":  (False, lambda t: t),
+    "fade_out": (False, lambda t: 1.0 - t),
+}
+
+# The colour of each reaction (0xRRGGBB).
+EMOTION_COLORS = {
+    "happy":      0x00FF00,  # green
+    "sad":        0x0000FF,  # blue
+    "angry":      0x9DD8E6,  # light blue
+    "frightened": 0xFFFF00,  # yellow
+    "surprise":   0xFF00FF,  # magenta
+}
+
+# How each reaction looks, per group: (pattern, period [ms]).
+EMOTION_PATTERNS = {
+    "happy":      {"face": ("pulse", 600),    "chest": ("breathe", 1500), "feet": ("solid", 0)},
+    "sad":        {"face": ("breathe", 3000), "chest": ("breathe", 3000), "feet": ("fade_out", 2000)},
+    "angry":      {"face": ("pulse", 250),    "chest": ("solid", 0),      "feet": ("pulse", 250)},
+    "frightened": {"face": ("pulse", 150),    "chest": ("breathe", 800),  "feet": ("solid", 0)},
+    "surprise":   {"face": ("fade_in", 300),  "chest": ("pulse", 400),    "feet": ("fade_in", 600)},
+}
+
+# A compiled animation: group -> (colour table, loops?)
+Animation = Dict[str, Tuple[np.ndarray, bool]]
+
+
+def emotion_colors(overrides: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """EMOTION_COLORS, with the reactions in overrides recoloured."""
+    return {**EMOTION_COLORS, **(overrides or {})}
+
+
+def emotion_patterns(overrides: Optional[Dict[str, Dict[str, Tuple[str, int]]]] = None
+                     ) -> Dict[str, Dict[str, Tuple[str, int]]]:
+    """EMOTION_PATTERNS, with the groups listed in overrides replaced per reaction."""
+    overrides = overrides or {}
+    return {reaction: {**EMOTION_PATTERNS.get(reaction, {}), **overrides.get(reaction, {})}
+            for reaction in {**EMOTION_PATTERNS, **overrides}}
+
+
+def color_table(pattern: str, color: int, period_ms: int, time_step: int) -> np.ndarray:
+    """One period of pattern in color, as int32 0xRRGGBB values, one per control step."""
+    loop, level = PATTERNS[pattern]
+    steps = max(1, int(period_ms / time_step))
+    # One-shot fades end exactly on their final level (phase 1), loops just before wrapping.
+    phase = (np.arange(steps) + (0.0 if loop else 1.0)) / steps
+    rgb = np.array([(color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF], dtype=float)
+    channels = np.rint(np.clip(level(phase), 0.0, 1.0)[:, None] * rgb).astype(np.int32)
+    return (channels[:, 0] << 16) | (channels[:, 1] << 8) | channels[:, 2]
+
+
+def compile_animations(patterns: Dict[str, Dict[str, Tuple[str, int]]], colors: Dict[str, int],
+                       time_step: int) -> Dict[str, Animation]:
+    """Precompute the tables of every reaction in patterns that has a colour in colors."""
+    return {reaction: {group: (color_table(pattern, colors[reaction], period_ms, time_step),
+                               PATTERNS[pattern][0])
+                       for group, (pattern, period_ms) in groups.items()}
+            for reaction, groups in patterns.items() if reaction in colors}
+
+
+class LedBank:
+    """
+    The LED groups; device(name) fetches one LED.
+
+    set() and off() show a solid colour and stop any animation on those
+    groups. animate() starts an Animation. tick() must run once per control
+    step to advance running animations.
+    """
+
+    def __init__(self, device: Callable[[str], object], groups: Dict[str, Sequence[str]] = LED_GROUPS):
+        self.groups = {group: [device(name) for name in names] for group, names in groups.items()}
+        self._tables: Animation = {}
+        self._index: Dict[str, int] = {}
+        self._shown: Dict[str, Optional[int]] = {group: None for group in self.groups}
+
+    @property
+    def animating(self) -> bool:
+        return bool(self._tables)
+
+    def set(self, color: int, group: Optional[str] = None):
+        """Show color (0xRRGGBB) on group, or on every group when None."""
+        for name in (self.groups if group is None else (group,)):
+            self._tables.pop(name, None)
+            self._show(name, color)
+
+    def off(self, group: Optional[str] = None):
+        """Turn group (every group when None) off."""
+        self.set(0x000000, group)
+
+    def animate(self, animation: Animation):
+        """Start animation on the groups it covers; other groups keep what they show."""
+        for group, entry in animation.items():
+            if group in self.groups:
+                self._tables[group] = entry
+                self._index[group] = 0
+
+    def tick(self):
+        """Advance every running animation by one control step."""
+        if not self._tables:
+            return
+        finished = []
+        for group, (table, loop) in self._tables.items():
+            i = self._index[group]
+            self._show(group, int(table[i]))
+            i += 1
+            if i == len(table):
+                if not loop:
+                    finished.append(group)   # a fade holds its last colour
+                i = 0
+            self._index[group] = i
+        for group in finished:
+            del self._tables[group]
+
+    def _show(self, group: str, color: int):
+        if self._shown[group] == color:
+            return
+        self._shown[group] = color
+        for led in self.groups[group]:
+            led.set(color)
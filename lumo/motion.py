@@ -0,0 +1,241 @@
+# lumo/motion.py
+#
+# Non-blocking motion sequencer. A gesture is a timeline of keyframes (joint
+# targets + velocities, held for a number of milliseconds). Before playback it
+# is compiled into a Trajectory: dense per-control-step NumPy arrays of joint
+# targets, so the sequencer advances by one row per tick() with no per-joint
+# Python branching, and the caller's main loop keeps reading the camera and
+# handling ESC while the gesture plays.
+
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from lumo.events import log
+
+# joint name -> (target position [rad], velocity [rad/s] or None to keep)
+Targets = Dict[str, Tuple[float, Optional[float]]]
+
+# A keyframe action or wait condition: a callable, or (in gestures loaded from
+# a data file) a name that Trajectory.bind() later resolves to one.
+Action = Union[Callable[[], Any], str]
+
+
+@dataclass
+class Keyframe:
+    """Joint targets applied together, then held for hold_ms (and while wait_for() is True)."""
+    targets: Targets = field(default_factory=dict)
+    hold_ms: int = 0
+    actions: List[Action] = field(default_factory=list)   # run before targets
+    wait_for: Optional[Action] = None                     # e.g. "still speaking"
+
+
+def pose(velocity: Optional[float], **positions: float) -> Targets:
+    """Build Targets moving every named joint at the same velocity."""
+    return {name: (position, velocity) for name, position in positions.items()}
+
+
+@dataclass
+class Gesture:
+    """A named timeline of keyframes."""
+    name: str
+    keyframes: List[Keyframe]
+
+    @property
+    def duration_ms(self) -> int:
+        return sum(kf.hold_ms for kf in self.keyframes)
+
+
+@dataclass
+class Trajectory:
+    """
+    A Gesture compiled for one control step length.
+
+    Row s of the (steps, joints) arrays is what happens on the s-th tick:
+    writes[s, j] marks joints commanded on that tick, positions[s] holds the
+    target in effect for every joint (NaN before its first command) and
+    velocities[s, j] the velocity sent with a write (NaN: keep). actions[s]
+    run on that tick before the targets; gates[s] holds playback before row s
+    while it returns True. Row `steps` is the end of the gesture.
+    """
+    name: str
+    joints: Tuple[str, ...]
+    positions: np.ndarray
+    velocities: np.ndarray
+    writes: np.ndarray
+    write_cols: List[np.ndarray]              # np.flatnonzero(writes[s]) per row
+    actions: Dict[int, List[Action]]
+    gates: Dict[int, Action]
+
+    @property
+    def steps(self) -> int:
+        return len(self.positions)
+
+    def bind(self, resolve: Callable[[str], Callable]) -> "Trajectory":
+        """Copy with named actions/gates replaced by resolve(name); arrays are shared."""
+        def bound(action):
+            return resolve(action) if isinstance(action, str) else action
+        return replace(self,
+                       actions={s: [bound(a) for a in acts] for s, acts in self.actions.items()},
+                       gates={s: bound(g) for s, g in self.gates.items()})
+
+
+def compile_gesture(gesture: Gesture, joints: Sequence[str], time_step: int) -> Trajectory:
+    """
+    Lay gesture out on the control-step grid over joints (every joint a
+    keyframe targets must be listed). Keyframes with hold_ms below one step
+    share a row with the next one, unless a wait_for separates them; on a
+    shared row the later position wins, and a velocity stays set unless a
+    later keyframe gives another.
+    """
+    index = {name: j for j, name in enumerate(joints)}
+    placed: List[Tuple[int, Keyframe]] = []
+    gates: Dict[int, Action] = {}
+    row, last, gate = 0, -1, None
+    for kf in gesture.keyframes:
+        if gate is not None:
+            row = max(row, last + 1)
+            gates[row] = gate
+        placed.append((row, kf))
+        last = row
+        row += int(kf.hold_ms / time_step)
+        gate = kf.wait_for
+    steps = max(row, last + 1)
+    if gate is not None:
+        gates[steps] = gate
+
+    positions = np.full((steps, len(joints)), np.nan)
+    velocities = np.full((steps, len(joints)), np.nan)
+    writes = np.zeros((steps, len(joints)), dtype=bool)
+    actions: Dict[int, List[Action]] = {}
+    for row, kf in placed:
+        if kf.actions:
+            actions.setdefault(row, []).extend(kf.actions)
+        for name, (position, velocity) in kf.targets.items():
+            j = index[name]
+            positions[row, j] = position
+            if velocity is not None:   # None keeps the velocity already on this row, as setVelocity would
+                velocities[row, j] = velocity
+            writes[row, j] = True
+
+    # Forward-fill so every row holds the target in effect at that step.
+    filled = np.where(writes, np.arange(steps)[:, None], 0)
+    np.maximum.accumulate(filled, axis=0, out=filled)
+    positions = np.where(writes.cumsum(axis=0) > 0, positions[filled, np.arange(len(joints))], np.nan)
+
+    return Trajectory(gesture.name, tuple(joints), positions, velocities, writes,
+                      [np.flatnonzero(w) for w in writes], actions, gates)
+
+
+class MotionSequencer:
+    """
+    Plays one gesture at a time, one control step per tick().
+
+    play() takes a Trajectory, or a Gesture which it compiles over its own
+    motors. It preempts whatever is running: joints the old gesture moved but
+    the new one does not command straight away are sent back to rest_pose, so
+    the robot blends from its current posture into the new gesture instead of
+    freezing half-way through the old one. on_done(name, steps), if given, is
+    called whenever a gesture ends (finished, preempted or cancelled) with the
+    number of control steps it ran for.
+    """
+
+    def __init__(self, motors: Dict[str, object], time_step: int, rest_pose: Optional[Targets] = None,
+                 on_done: Optional[Callable[[str, int], None]] = None):
+        self.motors = motors
+        self.time_step = time_step
+        self.rest_pose = rest_pose or {}
+        self.on_done = on_done
+        self._traj: Optional[Trajectory] = None
+        self._motor_list: List[object] = []
+        self._motor_lists: Dict[Tuple[str, ...], List[object]] = {}
+        self._step = 0
+        self._steps = 0
+
+    @property
+    def active(self) -> bool:
+        return self._traj is not None
+
+    @property
+    def current(self) -> Optional[str]:
+        """Name of the gesture being played, or None when idle."""
+        return self._traj.name if self._traj is not None else None
+
+    def play(self, gesture: Union[Gesture, Trajectory]):
+        """Start gesture on the next tick, cancelling the current one."""
+        if isinstance(gesture, Gesture):
+            gesture = compile_gesture(gesture, tuple(self.motors), self.time_step)
+        if self._traj is not None:
+            first = set()
+            if gesture.steps:
+                first = {gesture.joints[j] for j in gesture.write_cols[0]}
+            self._apply({name: target for name, target in self.rest_pose.items()
+                         if name in self._touched() and name not in first})
+            log.info("MOTION", f"{self._traj.name} interrupted by {gesture.name}")
+            self._done()
+        self._traj = gesture
+        self._motor_list = self._motors_for(gesture.joints)
+        self._step = 0
+        self._steps = 0
+
+    def cancel(self, to_rest: bool = True):
+        """Stop the current gesture, optionally sending moved joints to rest."""
+        if self._traj is None:
+            return
+        if to_rest:
+            touched = self._touched()
+            self._apply({name: target for name, target in self.rest_pose.items() if name in touched})
+        self._done()
+        self._traj = None
+
+    def tick(self) -> bool:
+        """Advance by one control step. Returns True while a gesture is playing."""
+        traj = self._traj
+        if traj is None:
+            return False
+        self._steps += 1
+        s = self._step
+        gate = traj.gates.get(s)
+        if gate is not None and gate():
+            return True
+        if s >= traj.steps:
+            self._done()
+            self._traj = None
+            return False
+
+        for action in traj.actions.get(s, ()):
+            action()
+        cols = traj.write_cols[s]
+        if len(cols):
+            positions, velocities, motors = traj.positions[s], traj.velocities[s], self._motor_list
+            for j in cols:
+                motor = motors[j]
+                motor.setPosition(float(positions[j]))
+                velocity = velocities[j]
+                if velocity == velocity:   # not NaN
+                    motor.setVelocity(float(velocity))
+        self._step = s + 1
+        return True
+
+    def _touched(self) -> set:
+        traj = self._traj
+        moved = traj.writes[:self._step].any(axis=0)
+        return {traj.joints[j] for j in np.flatnonzero(moved)}
+
+    def _motors_for(self, joints: Tuple[str, ...]) -> List[object]:
+        motors = self._motor_lists.get(joints)
+        if motors is None:
+            motors = self._motor_lists[joints] = [self.motors[name] for name in joints]
+        return motors
+
+    def _done(self):
+        if self.on_done is not None:
+            self.on_done(self._traj.name, self._steps)
+
+    def _apply(self, targets: Targets):
+        for name, (position, velocity) in targets.items():
+            motor = self.motors[name]
+            motor.setPosition(position)
+            if velocity is not None:
+                motor.setVelocity(velocity)
@@ -0,0 +1,295 @@
+# lumo/perception.py
+#
+# One perception pipeline for a room of robots. Without it, every Lumo
+# controller opens the webcam and loads its own emotion model, so N robots
+# mean N model copies in memory and N processes fighting over one camera.
+#
+# PerceptionServer (run by controllers/lumo_perception) owns the webcam, the
+# model and the preview window, and broadcasts every emotion result over a
+# local TCP socket. Each robot controller started with a perception address
+# (PERCEPTION, or the Webots controllerArgs "--perception=host:port") opens
+# no camera and loads no model. Its RemoteWorker receives the results
+# instead, and smoothing, cooldowns, behaviors and the robot itself stay
+# per controller, as before.
+#
+# Messages are one JSON object per line (an EmotionResult minus the
+# per-process timestamp). A robot that cannot keep up is disconnected
+# rather than slowing the host down, and RemoteWorker reconnects on its own,
+# so the host and the robots can be started in any order.
+
+import json
+import socket
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from lumo.events import _jsonable, log
+from lumo.inference import EmotionResult, FaceResult
+from lumo.pipeline import build_worker, open_webcam, start_worker
+from lumo.preview import WINDOW, HeadlessPreview, PreviewRenderer
+
+DEFAULT_ADDRESS = "127.0.0.1:5577"
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """("host", port) from "host:port" (or just ":port" for localhost)."""
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def encode_result(result: EmotionResult) -> bytes:
+    """One wire message for result."""
+    return (json.dumps({
+        "seq": result.seq, "dominant": result.dominant_emotion, "emotions": result.emotions,
+        "box": result.face_box, "probs": result.probs, "target": result.target,
+        "faces": [[face.box, face.probs, face.dominant_emotion] for face in result.faces],
+        "reused": result.reused, "cache_hits": result.cache_hits,
+        "cache_misses": result.cache_misses, "classified": result.classified,
+        "inference_s": result.inference_s, "latency_s": result.latency_s,
+    }, default=_jsonable) + "\n").encode()
+
+
+def decode_result(line: bytes) -> EmotionResult:
+    """The EmotionResult of a wire message, time-stamped on arrival."""
+    msg = json.loads(line)
+    probs = msg["probs"]
+    return EmotionResult(
+        seq=msg["seq"], dominant_emotion=msg["dominant"], emotions=msg["emotions"],
+        face_box=tuple(msg["box"]) if msg["box"] else None,
+        probs=np.asarray(probs, np.float32) if probs is not None else None,
+        timestamp=time.monotonic(), target=msg["target"],
+        faces=[FaceResult(tuple(box), np.asarray(p, np.float32), label) for box, p, label in msg["faces"]],
+        reused=msg["reused"], cache_hits=msg["cache_hits"],
+        cache_misses=msg["cache_misses"], classified=msg["classified"],
+        inference_s=msg["inference_s"], latency_s=msg["latency_s"])
+
+
+# ─── Robot side ──────────────────────────────────────────────────────────────
+
+class NoCamera:
+    """
+    FrameGrabber stand-in for a robot fed by a perception host. latest()
+    always returns the same placeholder frame, so the loop submits it once
+    (to RemoteWorker, which ignores it) and never reports a failed read.
+    """
+
+    def __init__(self):
+        self._frame = np.zeros((1, 1, 3), np.uint8)
+
+    def start(self):
+        pass
+
+    def stop(self, timeout: float = 1.0):
+        pass
+
+    def wait_first(self, timeout: float = 5.0) -> bool:
+        return True
+
+    def latest(self) -> Tuple[int, Optional[np.ndarray]]:
+        return 0, self._frame
+
+
+class RemoteWorker:
+    """
+    EmotionWorker stand-in that receives results from a PerceptionServer.
+
+    A background thread keeps (re)connecting to address and publishes each
+    result it reads; poll() and latest() behave like EmotionWorker's, and
+    submit() does nothing (the host has the camera).
+    """
+
+    cache = None
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, retry: float = 1.0):
+        self.address = address
+        self.retry = retry
+        self.connected = threading.Event()
+        self.received = 0
+        self._result: Optional[EmotionResult] = None
+        self._polled: Optional[EmotionResult] = None
+        self._sock: Optional[socket.socket] = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="RemoteWorker", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout: Optional[float] = 10.0):
+        """Wait until connected to the perception host (or timeout s)."""
+        if not self.connected.wait(timeout):
+            print(f"[WARN] No perception host at {self.address} yet; continuing and retrying.")
+
+    def stop(self, timeout: float = 2.0):
+        self._running = False
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, frame) -> Optional[int]:
+        return None
+
+    def poll(self) -> Optional[EmotionResult]:
+        """Return the latest result if it has not been returned before, else None."""
+        result = self._result
+        if result is None or result is self._polled:
+            return None
+        self._polled = result
+        return result
+
+    def latest(self) -> Optional[EmotionResult]:
+        return self._result
+
+    def _run(self):
+        host, port = parse_address(self.address)
+        while self._running:
+            try:
+                self._sock = socket.create_connection((host, port), timeout=self.retry)
+            except OSError:
+                time.sleep(self.retry)
+                continue
+            self._sock.settimeout(None)
+            self.connected.set()
+            log.info("INFO", f"Connected to perception host {self.address}.")
+            try:
+                with self._sock.makefile("rb") as stream:
+                    for line in stream:
+                        self._result = decode_result(line)
+                        self.received += 1
+            except (OSError, ValueError) as e:
+                log.warn("WARN", f"Perception host connection failed: {e}")
+            finally:
+                self._sock.close()
+                self._sock = None
+            self.connected.clear()
+            if self._running:
+                log.warn("WARN", f"Lost perception host {self.address}; reconnecting.")
+                time.sleep(self.retry)
+
+
+# ─── Host side ───────────────────────────────────────────────────────────────
+
+class PerceptionServer:
+    """
+    Webcam + emotion model + preview, shared by every robot that connects.
+
+    config is a LumoConfig; its capture, model, inference and preview
+    settings are used, the robot settings are not. run(step) loops until
+    step() returns -1 (a Webots robot.step), or until ESC without one.
+    """
+
+    def __init__(self, config, address: str = DEFAULT_ADDRESS, send_timeout: float = 0.1):
+        self.config = config
+        self.address = address
+        self.send_timeout = send_timeout
+        self.sent = 0
+        self.disconnected = 0
+        self._clients: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._listener: Optional[socket.socket] = None
+        self._running = False
+
+    def run(self, step=None):
+        self.start()
+        try:
+            self.loop(step)
+        finally:
+            self.shutdown()
+
+    def start(self):
+        cfg = self.config
+        log.configure(cfg.event_log, console_level=cfg.log_level, debug_every=cfg.debug_every)
+        self.cap, self.grabber = open_webcam(cfg)   # before the pool, which a failed open would leak
+        self.worker, preloader = build_worker(cfg)
+        self.preview = HeadlessPreview() if cfg.headless else PreviewRenderer(WINDOW, fps=cfg.preview_fps)
+        self.preview.start()
+
+        host, port = parse_address(self.address)
+        self._listener = socket.create_server((host, port))
+        self._running = True
+        threading.Thread(target=self._accept, name="PerceptionAccept", daemon=True).start()
+        print(f"[INFO] Perception host listening on {host}:{port}.")
+
+        start_worker(self.worker, preloader)
+
+    def loop(self, step=None):
+        period = self.config.time_step / 1000.0
+        last_frame_seq = -1
+        while True:
+            if step is not None:
+                if step() == -1:
+                    break
+            else:
+                time.sleep(period)
+            frame_seq, frame = self.grabber.latest()
+            if self.preview.closed:
+                log.info("INFO", "ESC pressed. Stopping the perception host.")
+                break
+            if frame is None:
+                continue
+            if frame_seq != last_frame_seq:
+                self.worker.submit(frame)
+                last_frame_seq = frame_seq
+            result = self.worker.poll()
+            if result is not None:
+                self.broadcast(result)
+            self.preview.show(frame_seq, frame, self.worker.latest())
+
+    def broadcast(self, result: EmotionResult):
+        """Send result to every connected robot; robots that cannot take it are dropped."""
+        with self._lock:
+            clients = list(self._clients)
+        if not clients:
+            return
+        message = encode_result(result)
+        for client in clients:
+            try:
+                client.sendall(message)
+                self.sent += 1
+            except OSError as e:
+                self._drop(client, e)
+
+    def shutdown(self):
+        print("[INFO] Cleaning up: stopping the perception host.")
+        self._running = False
+        if self._listener is not None:
+            self._listener.close()
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.close()
+        self.worker.stop()
+        self.grabber.stop()
+        self.cap.release()
+        self.preview.stop()
+        log.close()
+        print(f"[INFO] Perception host: {self.sent} results sent, {self.disconnected} robot connections dropped.")
+
+    def _accept(self):
+        while self._running:
+            try:
+                client, peer = self._listener.accept()
+            except OSError:
+                return
+            client.settimeout(self.send_timeout)
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._clients.append(client)
+            log.info("INFO", f"Robot connected from {peer[0]}:{peer[1]} ({len(self._clients)} connected).")
+
+    def _drop(self, client: socket.socket, error: OSError):
+        with self._lock:
+            if client not in self._clients:
+                return
+            self._clients.remove(client)
+        client.close()
+        self.disconnected += 1
+        log.info("INFO", f"Robot disconnected ({error or 'closed'}).")
@@ -0,0 +1,84 @@
+# lumo/pipeline.py
+#
+# The webcam and emotion-inference half of start-up, shared by Lumo
+# (lumo.core) and PerceptionServer (lumo.perception): open the webcam and its
+# FrameGrabber, build the change gate and cache, and build the emotion worker
+# (an InferencePool, or an in-process EmotionWorker whose model a
+# ModelPreloader loads in the background). Each takes a LumoConfig.
+
+import sys
+import time
+from typing import Callable, Optional, Tuple, Union
+
+import cv2
+
+from lumo.backends import make_backend
+from lumo.cache import EmotionCache
+from lumo.capture import FrameGrabber
+from lumo.inference import ChangeGate, EmotionWorker, ModelPreloader
+from lumo.pool import InferencePool
+from lumo.startup import StartupTimer
+
+
+def open_webcam(cfg) -> Tuple[cv2.VideoCapture, FrameGrabber]:
+    """Open webcam cfg.webcam_id and start grabbing from it; exits if it cannot be opened."""
+    cap = cv2.VideoCapture(cfg.webcam_id)
+    if not cap.isOpened():
+        print(f"[ERROR] Cannot open webcam at index {cfg.webcam_id}")
+        sys.exit(1)
+    print(f"[INFO] Webcam (ID={cfg.webcam_id}) opened successfully.")
+    # Lower capture resolution to reduce model load
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, cfg.display_w)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, cfg.display_h)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # not every backend honours this; the grabber drains the rest
+
+    # Capture on a background thread so the driver never queues stale frames
+    grabber = FrameGrabber(cap, cfg.display_w, cfg.display_h)
+    grabber.start()
+    if not grabber.wait_first():
+        print("[WARN] No webcam frame received yet; continuing anyway.")
+    return cap, grabber
+
+
+def change_gate(cfg) -> Optional[ChangeGate]:
+    return ChangeGate(cfg.skip_threshold, cfg.skip_max_stale) if cfg.skip_threshold is not None else None
+
+
+def emotion_cache(cfg, clock: Callable[[], float] = time.monotonic) -> Optional[EmotionCache]:
+    """The cache for cfg (None if disabled); its TTL runs on clock."""
+    if cfg.cache_size <= 0:
+        return None
+    return EmotionCache(cfg.cache_size, cfg.cache_ttl, cfg.cache_max_distance, clock=clock)
+
+
+def build_worker(cfg, timer: Optional[StartupTimer] = None, clock: Callable[[], float] = time.monotonic
+                 ) -> Tuple[Union[InferencePool, EmotionWorker], Optional[ModelPreloader]]:
+    """
+    The emotion worker for cfg and, for an in-process worker, its model
+    preloader. A pool is started at once (every process loads its own
+    model); an EmotionWorker is started by start_worker() once its model is
+    loaded, which begins now if cfg.parallel_model_load. clock is the cache's
+    (it must pickle for a pool).
+    """
+    gate, cache = change_gate(cfg), emotion_cache(cfg, clock)
+    if cfg.inference_workers > 0:
+        pool = InferencePool(cfg.emotion_backend, cfg.inference_workers, (cfg.display_h, cfg.display_w, 3),
+                             policy=cfg.target_policy, gate=gate, cache=cache)
+        pool.start()
+        return pool, None
+    backend = make_backend(cfg.emotion_backend)
+    preloader = ModelPreloader(backend, timer)
+    if cfg.parallel_model_load:
+        preloader.start()
+    return EmotionWorker(backend, policy=cfg.target_policy, gate=gate, cache=cache), preloader
+
+
+def start_worker(worker: Union[InferencePool, EmotionWorker], preloader: Optional[ModelPreloader]):
+    """Block until worker's model is loaded and warmed up, then let it take frames."""
+    if preloader is None:
+        worker.wait_ready()
+        return
+    if preloader.ident is None:   # not started by build_worker (parallel_model_load off)
+        preloader.start()
+    preloader.wait()
+    worker.start()
@@ -0,0 +1,194 @@
+# lumo/pool.py
+#
+# Multi-process emotion inference. The in-process EmotionWorker shares one
+# core (and the GIL) with capture, display, speech and robot control;
+# InferencePool instead runs N worker processes, each with its own copy of
+# the model, face tracker, change gate and cache.
+#
+# Frames are not pickled. The pool has as many slots as workers, each a
+# fixed-shape multiprocessing.shared_memory block (DISPLAY_H x DISPLAY_W x 3
+# uint8). Slots are not tied to a worker: submit() copies the frame into a
+# free slot and puts only (slot, sequence number) on the one task queue all
+# workers share, and whichever worker is idle takes it. The slot is free
+# again once its result comes back, on a small queue tagged with the frame's
+# sequence number. A result older than one already published is discarded,
+# so Lumo never steps back to an older frame. When every slot is taken, new
+# frames are dropped rather than queued, so the newest frame always wins, as
+# with EmotionWorker. A worker that cannot load the model exits; once all of
+# them have, the pool raises instead of holding its slots forever.
+#
+# Worker processes are spawned, not forked (TensorFlow does not survive a
+# fork, and Windows can only spawn). Spawning re-imports the controller
+# script, so its run call must sit under `if __name__ == "__main__":`.
+
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from lumo.backends import make_backend
+from lumo.cache import EmotionCache
+from lumo.inference import ANALYSIS_H, ANALYSIS_W, ChangeGate, EmotionResult, EmotionWorker
+
+
+def _serve(index: int, backend_name: str, shape: Tuple[int, ...], slot_names: Sequence[str], policy: str,
+           gate: Optional[ChangeGate], cache: Optional[EmotionCache], tasks, results):
+    """Worker process: load the model, then analyse shared-memory slots until a None task arrives."""
+    blocks = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    frames = [np.ndarray(shape, np.uint8, buffer=block.buf) for block in blocks]
+    try:
+        try:
+            backend = make_backend(backend_name)
+            backend.load()
+            worker = EmotionWorker(backend, policy=policy, gate=gate, cache=cache)
+        except Exception as e:
+            results.put(("error", index, str(e)))
+            return
+        results.put(("ready", index, None))
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            slot, seq = task
+            started = time.perf_counter()
+            small = cv2.resize(frames[slot], (ANALYSIS_W, ANALYSIS_H))
+            result = worker._analyze(small, seq)
+            result.inference_s = time.perf_counter() - started
+            results.put(("result", slot, result))
+    finally:
+        del frames   # the views must go before the blocks can close
+        for block in blocks:
+            block.close()
+
+
+class InferencePool:
+    """
+    EmotionWorker stand-in that analyses frames in `workers` processes.
+
+    submit(), poll() and latest() behave like EmotionWorker's. The worker
+    processes build their own model from backend_name; gate and cache are
+    copied into every process. Their counters stay there, and each
+    EmotionResult reports its own share. dropped counts frames that
+    arrived while every slot was taken, and discarded counts results that
+    came back out of order. wait_ready() and poll() raise RuntimeError once
+    every worker has failed to load the model.
+    """
+
+    def __init__(self, backend_name: str, workers: int, frame_shape: Tuple[int, int, int] = (240, 320, 3),
+                 policy: str = "largest", gate: Optional[ChangeGate] = None,
+                 cache: Optional[EmotionCache] = None):
+        self.workers = workers
+        self.frame_shape = tuple(frame_shape)
+        self.gate = None    # per process, see above
+        self.cache = None
+        self.dropped = 0
+        self.discarded = 0
+        self.failed = 0     # workers that could not load the model
+        ctx = multiprocessing.get_context("spawn")
+        self._blocks = [shared_memory.SharedMemory(create=True, size=int(np.prod(self.frame_shape)))
+                        for _ in range(workers)]
+        self._frames = [np.ndarray(self.frame_shape, np.uint8, buffer=block.buf) for block in self._blocks]
+        self._free: List[int] = list(range(workers))
+        self._submitted: Dict[int, float] = {}   # slot -> submit() time
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        names = [block.name for block in self._blocks]
+        self._procs = [ctx.Process(target=_serve, name=f"EmotionPool-{i}", daemon=True,
+                                   args=(i, backend_name, self.frame_shape, names, policy, gate, cache,
+                                         self._tasks, self._results))
+                       for i in range(workers)]
+        self._seq = 0
+        self._published = 0
+        self._result: Optional[EmotionResult] = None
+
+    def start(self):
+        """Spawn the worker processes; they load their models in parallel."""
+        for proc in self._procs:
+            proc.start()
+        print(f"[INFO] Emotion inference pool started ({self.workers} processes).")
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        """Block until every worker has loaded its model (or failed to); stops and raises if all failed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pending = self.workers
+        while pending:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                kind, index, error = self._results.get(timeout=left)
+            except queue.Empty:
+                print(f"[WARN] {pending} inference worker(s) not ready yet; continuing anyway.")
+                return
+            pending -= 1
+            if kind == "error":
+                try:
+                    self._worker_failed(index, error)
+                except RuntimeError:
+                    self.stop()   # nothing will ever serve the slots; release them before start-up fails
+                    raise
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the workers and release the shared memory."""
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc in self._procs:
+            if proc.pid is not None:
+                proc.join(timeout)
+                if proc.is_alive():
+                    proc.terminate()
+        self._frames = []
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def submit(self, frame) -> Optional[int]:
+        """Copy a BGR frame into a free slot; returns its seq, or None (dropped) if all are taken."""
+        if not self._free:
+            self.dropped += 1
+            return None
+        if frame.shape != self.frame_shape:
+            frame = cv2.resize(frame, (self.frame_shape[1], self.frame_shape[0]))
+        slot = self._free.pop()
+        np.copyto(self._frames[slot], frame)
+        self._seq += 1
+        self._submitted[slot] = time.perf_counter()
+        self._tasks.put((slot, self._seq))
+        return self._seq
+
+    def poll(self) -> Optional[EmotionResult]:
+        """Return the newest result that arrived since the last call, else None."""
+        newest = None
+        while True:
+            try:
+                kind, slot, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if kind != "result":
+                if kind == "error":
+                    self._worker_failed(slot, payload)
+                continue
+            payload.latency_s = time.perf_counter() - self._submitted.pop(slot)
+            self._free.append(slot)
+            if payload.seq <= self._published:
+                self.discarded += 1
+                continue
+            self._published = payload.seq
+            newest = payload
+        if newest is not None:
+            self._result = newest
+        return newest
+
+    def latest(self) -> Optional[EmotionResult]:
+        """Return the last published result (may be None before the first one)."""
+        return self._result
+
+    def _worker_failed(self, index: int, error: str):
+        self.failed += 1
+        print(f"[WARN] Inference worker {index} failed to load the emotion model: {error}")
+        if self.failed >= self.workers:
+            raise RuntimeError(f"All {self.workers} inference workers failed to load the emotion model "
+                               f"({error}); no frame can be analysed.")
@@ -0,0 +1,153 @@
+# lumo/preview.py
+#
+# Webcam preview, decoupled from the control loop. The loop hands over the
+# newest frame and emotion result on every step; show() copies a frame (the
+# grabber recycles its slots) only when it is new and a draw is due, so one
+# copy per preview frame, whatever the loop rate. A renderer thread owns the
+# OpenCV window: at most `fps` times per second it swaps that copy for its
+# draw buffer, draws the overlays (face boxes, emotion label, per-class bars,
+# stage timings), shows it and polls the keyboard for ESC.
+# HeadlessPreview has the same interface and no window at all, for
+# production runs.
+
+import threading
+import time
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+
+from lumo.backends import EMOTION_LABELS
+from lumo.inference import ANALYSIS_W, EmotionResult
+from lumo.instrumentation import LoopInstruments
+
+WINDOW = "Webcam Feed"
+
+_GREEN = (0, 255, 0)
+_GREY = (160, 160, 160)
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class HeadlessPreview:
+    """No window: show() is a no-op and ESC cannot be pressed."""
+
+    closed = False
+
+    def start(self):
+        print("[INFO] Headless mode: no preview window; stop the simulation to exit.")
+
+    def show(self, frame_seq: int, frame: Optional[np.ndarray], result: Optional[EmotionResult]):
+        pass
+
+    def stop(self, timeout: float = 2.0):
+        pass
+
+
+class PreviewRenderer:
+    """
+    Draws the preview window on its own thread at up to fps frames/sec.
+
+    show() copies a new frame into a reused buffer once a draw is due and
+    never waits for the draw. closed turns True once ESC is
+    pressed in the window. stages are the LoopInstruments stages whose
+    median times are overlaid, if perf is given.
+    """
+
+    def __init__(self, window: str = WINDOW, fps: float = 10.0, perf: Optional[LoopInstruments] = None,
+                 stages: Sequence[str] = ("loop", "capture", "inference", "latency")):
+        self.window = window
+        self.fps = fps
+        self.perf = perf
+        self.stages = tuple(stages)
+        self._lock = threading.Lock()
+        self._frame: Optional[np.ndarray] = None   # show()'s copy of the newest frame
+        self._frame_seq = -1
+        self._result: Optional[EmotionResult] = None
+        self._fresh = False                         # _frame not drawn yet
+        self._buffer: Optional[np.ndarray] = None   # the renderer's, swapped with _frame
+        self._next_draw = 0.0
+        self._closed = threading.Event()
+        self._running = False
+        self._thread = None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def start(self):
+        """Open the window and start drawing."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="PreviewRenderer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stop drawing and close the window."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def show(self, frame_seq: int, frame: Optional[np.ndarray], result: Optional[EmotionResult]):
+        """Offer the newest frame (grabber sequence number frame_seq) and emotion result."""
+        with self._lock:
+            self._result = result
+            if frame is None or frame_seq == self._frame_seq:
+                return
+            # Copy only what will be drawn: the first new frame once a draw is due
+            if self._fresh or time.perf_counter() < self._next_draw:
+                return
+            # The grabber only holds its slot until the next latest(); keep our own copy
+            if self._frame is None or self._frame.shape != frame.shape:
+                self._frame = np.empty_like(frame)
+            np.copyto(self._frame, frame)
+            self._frame_seq, self._fresh = frame_seq, True
+
+    def _run(self):
+        cv2.namedWindow(self.window, cv2.WINDOW_AUTOSIZE)
+        cv2.moveWindow(self.window, 0, 0)
+        period = 1.0 / self.fps
+        next_draw = self._next_draw = time.perf_counter()
+        while self._running:
+            # waitKey both paces the preview and keeps the window responsive
+            wait_ms = max(1, int((next_draw - time.perf_counter()) * 1000))
+            if cv2.waitKey(wait_ms) & 0xFF == 27:  # ESC
+                self._closed.set()
+                break
+            now = time.perf_counter()
+            if now < next_draw:
+                continue
+            with self._lock:
+                fresh = self._fresh
+                if fresh:   # else keep polling until show() has copied a new frame
+                    # Take show()'s copy; show() writes the next frame into our old buffer
+                    self._buffer, self._frame = self._frame, self._buffer
+                    result = self._result
+                    self._fresh = False
+                    next_draw = self._next_draw = max(next_draw + period, now)
+            if fresh:
+                cv2.imshow(self.window, self._draw(self._buffer, result))
+        cv2.destroyWindow(self.window)
+
+    def _draw(self, img: np.ndarray, result: Optional[EmotionResult]) -> np.ndarray:
+        """Draw the overlays onto img in place."""
+        h, w = img.shape[:2]
+
+        if result is not None:
+            scale = w / ANALYSIS_W
+            for i, face in enumerate(result.faces):
+                x, y, bw, bh = (int(v * scale) for v in face.box)
+                cv2.rectangle(img, (x, y), (x + bw, y + bh), _GREEN if i == result.target else _GREY, 1)
+            if result.dominant_emotion:
+                cv2.putText(img, f"Emotion: {result.dominant_emotion}", (10, 30), _FONT, 0.8, _GREEN, 2)
+            if result.probs is not None:
+                for i, (label, p) in enumerate(zip(EMOTION_LABELS, result.probs)):
+                    y = h - 10 - 12 * (len(EMOTION_LABELS) - 1 - i)
+                    cv2.rectangle(img, (70, y - 8), (70 + int(80 * float(p)), y), _GREEN, -1)
+                    cv2.putText(img, label, (5, y), _FONT, 0.35, _GREEN, 1)
+
+        if self.perf is not None:
+            for i, name in enumerate(self.stages):
+                hist = self.perf.histograms.get(name)
+                if hist is not None and hist.n:
+                    cv2.putText(img, f"{name} {hist.percentile(50) * 1e3:.1f} ms", (w - 120, 15 + 14 * i),
+                                _FONT, 0.35, _GREEN, 1)
+        return img
@@ -0,0 +1,335 @@
+# lumo/recording.py
+#
+# Session recording: what the controller saw and did, kept for analysis after
+# the fact. A session is a directory of append-only files:
+#
+#   manifest.json              streams, column types, row counts, device names
+#   frames/data.bin            captured frames, JPEG-encoded (or raw BGR) back to back
+#   frames/<column>.bin        seq, sim, wall, offset, length of every frame
+#   emotions/<column>.bin      frame, sim, probs[7], faces, target, latency_ms
+#   commands/<column>.bin      sim, device, command, value of every actuator write
+#
+# Every numeric column is a flat little-endian array of one dtype, so a reader
+# maps it with np.memmap and slices or aggregates hours of data without
+# loading it. Rows are written in chunks (chunk_rows rows, or every
+# flush_every seconds) and manifest.json is replaced after each chunk; a
+# crash loses at most the unflushed chunk, and the row counts in the
+# manifest never point past data that was written.
+#
+# The control loop only copies (and downsamples) frames and puts tuples on a
+# bounded queue; a background thread encodes and writes. If the queue is full
+# records are dropped and counted, like the event log.
+#
+#   python -m lumo.recording sessions/session-20260101-120000-4242
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from lumo.backends import EMOTION_LABELS
+
+VERSION = 1
+COMMANDS = ("setPosition", "setVelocity", "set")
+_STOP = None
+
+# stream -> column -> (dtype, shape of one row)
+SCHEMA: Dict[str, Dict[str, Tuple[str, Tuple[int, ...]]]] = {
+    "frames": {
+        "seq": ("<i8", ()), "sim": ("<f8", ()), "wall": ("<f8", ()),
+        "offset": ("<i8", ()), "length": ("<i4", ()),
+    },
+    "emotions": {
+        "frame": ("<i8", ()), "sim": ("<f8", ()), "probs": ("<f4", (len(EMOTION_LABELS),)),
+        "faces": ("<i2", ()), "target": ("<i2", ()), "latency_ms": ("<f4", ()),
+    },
+    "commands": {
+        "sim": ("<f8", ()), "device": ("<u2", ()), "command": ("<u1", ()), "value": ("<f8", ()),
+    },
+}
+
+
+class _Stream:
+    """One columnar stream: rows are buffered, then appended to one file per column."""
+
+    def __init__(self, directory: str, columns: Dict[str, Tuple[str, Tuple[int, ...]]]):
+        os.makedirs(directory, exist_ok=True)
+        self.columns = columns
+        self.rows = 0
+        self._pending: List[tuple] = []
+        self._files = {name: open(os.path.join(directory, name + ".bin"), "ab") for name in columns}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def append(self, row: tuple):
+        self._pending.append(row)
+
+    def flush(self) -> bool:
+        """Append the buffered rows to the column files; False if there were none."""
+        if not self._pending:
+            return False
+        for (name, (dtype, shape)), values in zip(self.columns.items(), zip(*self._pending)):
+            data = np.asarray(values, dtype=dtype).reshape((len(values),) + shape)
+            f = self._files[name]
+            f.write(data.tobytes())
+            f.flush()
+        self.rows += len(self._pending)
+        self._pending = []
+        return True
+
+    def describe(self) -> dict:
+        return {"rows": self.rows,
+                "columns": {name: {"dtype": dtype, "shape": list(shape)}
+                            for name, (dtype, shape) in self.columns.items()}}
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+class SessionRecorder:
+    """
+    Records frames, emotion results and actuator commands to a session directory.
+
+    frame_every keeps every N-th submitted frame (0: no frames), scaled by
+    frame_scale and JPEG-encoded at jpeg_quality (None: raw BGR). sim is
+    the simulation time stamped on commands; the controller updates it once
+    per step. meta is stored in the manifest as is.
+    """
+
+    def __init__(self, path: str, frame_every: int = 1, frame_scale: float = 0.5,
+                 jpeg_quality: Optional[int] = 80, chunk_rows: int = 1024, flush_every: float = 2.0,
+                 capacity: int = 8192, meta: Optional[dict] = None):
+        self.path = path
+        self.frame_every = frame_every
+        self.frame_scale = frame_scale
+        self.jpeg_quality = jpeg_quality
+        self.chunk_rows = chunk_rows
+        self.flush_every = flush_every
+        self.meta = dict(meta or {})
+        self.sim = 0.0
+        self.dropped = 0
+        self.devices: List[str] = []
+        self._device_ids: Dict[str, int] = {}
+        self._command_ids = {name: i for i, name in enumerate(COMMANDS)}
+        self._frames_seen = 0
+        self._frame_size: Optional[Tuple[int, int]] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=capacity)
+        self._streams: Dict[str, _Stream] = {}
+        self._data = None
+        self._data_size = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def new_session(directory: str) -> str:
+        """A fresh session path under directory, named after the current time and process."""
+        return os.path.join(directory, time.strftime("session-%Y%m%d-%H%M%S") + f"-{os.getpid()}")
+
+    def start(self):
+        """Create the session directory (it must not exist yet) and start the writer thread."""
+        os.makedirs(self.path)
+        self._streams = {name: _Stream(os.path.join(self.path, name), columns)
+                         for name, columns in SCHEMA.items()}
+        self._data = open(os.path.join(self.path, "frames", "data.bin"), "ab")
+        self._data_size = self._data.tell()
+        self._write_manifest()
+        self._thread = threading.Thread(target=self._run, name="SessionRecorder", daemon=True)
+        self._thread.start()
+        print(f"[INFO] Recording session to {self.path}")
+
+    def stop(self):
+        """Write out everything queued and close the files."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        for stream in self._streams.values():
+            stream.close()
+        self._data.close()
+
+    # Called from the control loop -------------------------------------------
+
+    def frame(self, seq: Optional[int], frame: np.ndarray, sim: float):
+        """A frame handed to the emotion model as number seq (None: the worker dropped it)."""
+        if seq is None or not self.frame_every:
+            return
+        self._frames_seen += 1
+        if (self._frames_seen - 1) % self.frame_every:
+            return
+        if self.frame_scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.frame_scale, fy=self.frame_scale,
+                               interpolation=cv2.INTER_AREA)
+        else:
+            frame = frame.copy()    # the grabber reuses its buffers
+        self._put(("frame", seq, sim, time.time(), frame))
+
+    def emotion(self, frame: int, sim: float, probs: Optional[np.ndarray], faces: int,
+                target: Optional[int], latency_s: float):
+        """One emotion result; probs None (no face) is stored as NaNs."""
+        if probs is None:
+            probs = np.full(len(EMOTION_LABELS), np.nan, np.float32)
+        self._put(("emotions", (frame, sim, probs, faces, -1 if target is None else target, latency_s * 1e3)))
+
+    def command(self, device: str, command: str, value: float):
+        """One actuator write sent to the robot at the current sim time."""
+        index = self._device_ids.get(device)
+        if index is None:
+            index = self._device_ids[device] = len(self.devices)
+            self.devices.append(device)
+        self._put(("commands", (self.sim, index, self._command_ids.get(command, 255), value)))
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    # Writer thread -----------------------------------------------------------
+
+    def _run(self):
+        streams = self._streams
+        next_flush = time.monotonic() + self.flush_every
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+            except queue.Empty:
+                item = ()
+            if item is _STOP:
+                running = False
+            elif item and item[0] == "frame":
+                self._write_frame(*item[1:])
+            elif item:
+                streams[item[0]].append(item[1])
+            now = time.monotonic()
+            if not running or now >= next_flush:
+                flushed = [stream.flush() for stream in streams.values()]
+                next_flush = now + self.flush_every
+            else:
+                flushed = [stream.flush() for stream in streams.values() if len(stream) >= self.chunk_rows]
+            if any(flushed):
+                self._write_manifest()
+
+    def _write_frame(self, seq: int, sim: float, wall: float, frame: np.ndarray):
+        if self._frame_size is None:
+            self._frame_size = (frame.shape[1], frame.shape[0])
+            self._write_manifest()
+        if self.jpeg_quality is not None:
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                return
+            data = encoded.tobytes()
+        else:
+            data = frame.tobytes()
+        self._data.write(data)
+        self._streams["frames"].append((seq, sim, wall, self._data_size, len(data)))
+        self._data_size += len(data)
+
+    def _write_manifest(self):
+        self._data.flush()   # frame bytes before the rows that point at them
+        manifest = {
+            "version": VERSION,
+            "meta": self.meta,
+            "labels": list(EMOTION_LABELS),
+            "devices": list(self.devices),
+            "commands": list(COMMANDS),
+            "frames": {"format": "raw" if self.jpeg_quality is None else "jpeg",
+                       "size": list(self._frame_size) if self._frame_size else None},
+            "streams": {name: stream.describe() for name, stream in self._streams.items()},
+        }
+        path = os.path.join(self.path, "manifest.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+
+class SessionReader:
+    """
+    Read access to a recorded session; columns are memory-mapped, not loaded.
+
+        session = SessionReader("sessions/session-20260101-120000-4242")
+        probs = session.column("emotions", "probs")      # (rows, 7) memmap
+        image = session.frame(0)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.labels: List[str] = self.manifest["labels"]
+        self.devices: List[str] = self.manifest["devices"]
+        self.commands: List[str] = self.manifest["commands"]
+
+    def rows(self, stream: str) -> int:
+        return self.manifest["streams"][stream]["rows"]
+
+    def column(self, stream: str, name: str) -> np.ndarray:
+        """Column name of stream as a read-only array of shape (rows,) + row shape."""
+        spec = self.manifest["streams"][stream]["columns"][name]
+        shape = (self.rows(stream),) + tuple(spec["shape"])
+        if not shape[0]:
+            return np.empty(shape, spec["dtype"])
+        return np.memmap(os.path.join(self.path, stream, name + ".bin"), dtype=spec["dtype"], mode="r",
+                         shape=shape)
+
+    def table(self, stream: str) -> Dict[str, np.ndarray]:
+        """Every column of stream, by name."""
+        return {name: self.column(stream, name) for name in self.manifest["streams"][stream]["columns"]}
+
+    def frame(self, index: int) -> np.ndarray:
+        """The index-th recorded frame as a BGR image."""
+        offset = int(self.column("frames", "offset")[index])
+        length = int(self.column("frames", "length")[index])
+        data = np.memmap(os.path.join(self.path, "frames", "data.bin"), dtype=np.uint8, mode="r",
+                         offset=offset, shape=(length,))
+        info = self.manifest["frames"]
+        if info["format"] == "jpeg":
+            return cv2.imdecode(np.asarray(data), cv2.IMREAD_COLOR)
+        width, height = info["size"]
+        return np.array(data).reshape(height, width, 3)
+
+    def summary(self, top: int = 10) -> List[str]:
+        """Human-readable overview: rows per stream, duration, mean emotion, busiest devices."""
+        lines = []
+        for name in self.manifest["streams"]:
+            lines.append(f"{name:<9} {self.rows(name):9d} rows")
+        sim = self.column("emotions", "sim")
+        if len(sim):
+            lines.append(f"duration  {float(sim[-1] - sim[0]):9.1f} s simulated")
+            probs = self.column("emotions", "probs")
+            seen = ~np.isnan(probs[:, 0])
+            if seen.any():
+                mean = probs[seen].mean(axis=0)
+                lines.append("mean      " + ", ".join(f"{label} {p:.2f}" for label, p in zip(self.labels, mean)))
+            latency = self.column("emotions", "latency_ms")
+            lines.append(f"latency   p50 {np.percentile(latency, 50):.1f} ms, p95 {np.percentile(latency, 95):.1f} ms")
+        devices = self.column("commands", "device")
+        if len(devices):
+            counts = np.bincount(devices, minlength=len(self.devices))
+            for index in np.argsort(counts)[::-1][:top]:
+                if counts[index]:
+                    lines.append(f"  {self.devices[index]:<22} {counts[index]:8d} commands")
+        return lines
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Summarise a recorded Lumo session.")
+    parser.add_argument("session", help="session directory (see RECORD_DIR in the controllers)")
+    parser.add_argument("--top", type=int, default=10, help="devices to list by command count")
+    args = parser.parse_args(argv)
+    session = SessionReader(args.session)
+    print(f"[SESSION] {args.session}")
+    for line in session.summary(args.top):
+        print(f"[SESSION]   {line}")
+
+
+if __name__ == "__main__":
+    main()
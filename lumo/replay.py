@@ -0,0 +1,394 @@
+# lumo/replay.py
+#
+# Offline replay: run a controller script against a recorded video (or a
+# directory of images) without Webots, a webcam or a GUI.
+#
+#   python -m lumo.replay controllers/lumo_expressive/lumo_expressive.py clip.mp4
+#   python -m lumo.replay controllers/lumo_minimal/lumo_minimal.py frames/ --timeline out.jsonl
+#
+# The controller runs unmodified. Before it starts, the `controller` module is
+# replaced by a stub Robot whose devices record every command, and lumo.core's
+# webcam by the recording, its GUI by no-ops and its speech by a recorder. Capture and
+# inference become synchronous so each run is deterministic: every control
+# step consumes exactly one frame, and every frame goes through detection,
+# inference, smoothing and dispatch. Smoothing cooldowns and the emotion
+# cache's TTL run in simulation time. The run goes as fast as the model allows
+# and stops when the recording ends; frames/sec and the emitted emotion and
+# action timeline are reported at the end.
+
+import argparse
+import json
+import os
+import runpy
+import sys
+import time
+import types
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from lumo import backends, behavior, cache, capture, core, inference, motion, pipeline, smoothing
+from lumo.preview import HeadlessPreview
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+@dataclass
+class Event:
+    """One entry of the replay timeline."""
+    time: float        # simulation time (s)
+    frame: int         # frames consumed so far
+    kind: str          # "emotion", "trigger", "behavior", "gesture", "say" or "command"
+    value: Any
+
+
+@dataclass
+class ReplaySession:
+    """Everything recorded during one replay run."""
+    events: List[Event] = field(default_factory=list)
+    commands: int = 0
+    frames: int = 0
+    analysed: int = 0
+    sim_time: float = 0.0
+    wall_time: float = 0.0
+    keep_commands: bool = False
+
+    def log(self, kind: str, value: Any):
+        self.events.append(Event(self.sim_time, self.frames, kind, value))
+
+    def command(self, device: str, method: str, args: Tuple):
+        self.commands += 1
+        if self.keep_commands:
+            self.log("command", [device, method, list(args)])
+
+    def report(self):
+        fps = self.frames / self.wall_time if self.wall_time > 0 else 0.0
+        print(f"[REPLAY] {self.frames} frames ({self.analysed} analysed) in {self.wall_time:.2f}s "
+              f"wall = {fps:.1f} frames/s; {self.sim_time:.2f}s simulated, {self.commands} device commands.")
+        last = None
+        for event in self.events:
+            if event.kind == "command":
+                continue
+            if event.kind == "emotion":
+                if event.value == last:
+                    continue     # only print changes of the per-frame estimate
+                last = event.value
+            print(f"[REPLAY]   t={event.time:7.2f}s  frame {event.frame:5d}  {event.kind:<8} {event.value}")
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            for event in self.events:
+                f.write(json.dumps({"time": round(event.time, 4), "frame": event.frame,
+                                    "kind": event.kind, "value": event.value}) + "\n")
+
+
+# ─── Frame source ────────────────────────────────────────────────────────────
+
+class ReplayCapture:
+    """cv2.VideoCapture look-alike over a video file or a directory of images."""
+
+    def __init__(self, path: str):
+        self._video = None
+        self._files: List[str] = []
+        self._next = 0
+        if os.path.isdir(path):
+            self._files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                 if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            self._video = cv2.VideoCapture(path)
+
+    def isOpened(self) -> bool:
+        return bool(self._files) or (self._video is not None and self._video.isOpened())
+
+    def read(self, image=None):
+        if self._video is not None:
+            return self._video.read()
+        while self._next < len(self._files):
+            frame = cv2.imread(self._files[self._next])
+            self._next += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def set(self, prop, value) -> bool:
+        return False
+
+    def get(self, prop) -> float:
+        return self._video.get(prop) if self._video is not None else 0.0
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+
+
+class ReplayGrabber(capture.FrameGrabber):
+    """Synchronous FrameGrabber: every latest() call reads the next frame."""
+
+    session: ReplaySession = None
+
+    def __init__(self, cap, width: int, height: int, slots: int = 3):
+        self.cap = cap
+        self.width = width
+        self.height = height
+        self._buffer = np.zeros((height, width, 3), dtype=np.uint8)
+        self._seq = 0
+        self.exhausted = False
+
+    def start(self):
+        pass
+
+    def stop(self, timeout: float = 1.0):
+        pass
+
+    def wait_first(self, timeout: float = 5.0) -> bool:
+        return True
+
+    def latest(self) -> Tuple[int, Optional[np.ndarray]]:
+        ok, frame = self.cap.read()
+        if not ok or frame is None:
+            self.exhausted = True
+            return self._seq, None
+        if frame.shape[:2] == (self.height, self.width):
+            np.copyto(self._buffer, frame)
+        else:
+            cv2.resize(frame, (self.width, self.height), dst=self._buffer)
+        self._seq += 1
+        self.session.frames += 1
+        return self._seq, self._buffer
+
+
+# ─── Perception and dispatch ─────────────────────────────────────────────────
+
+class ReplayWorker(inference.EmotionWorker):
+    """EmotionWorker (or InferencePool) that analyses each submitted frame on the caller's thread."""
+
+    session: ReplaySession = None
+    dropped = 0
+    discarded = 0
+
+    def start(self):
+        pass
+
+    def wait_ready(self, timeout: float = None):
+        pass
+
+    def stop(self, timeout: float = 2.0):
+        pass
+
+    def submit(self, frame):
+        submitted = time.perf_counter()
+        small = cv2.resize(frame, (inference.ANALYSIS_W, inference.ANALYSIS_H))
+        self._pending_seq += 1
+        result = self._analyze(small, self._pending_seq)
+        result.inference_s = result.latency_s = time.perf_counter() - submitted
+        self._result = result
+        self.session.analysed += 1
+        self.session.log("emotion", result.dominant_emotion)
+        return self._pending_seq
+
+
+class ReplayCache(cache.EmotionCache):
+    """EmotionCache whose TTL runs in simulation time, so expiry does not depend on model speed."""
+
+    session: ReplaySession = None
+
+    def __init__(self, *args, **kwargs):
+        kwargs["clock"] = lambda: self.session.sim_time
+        super().__init__(*args, **kwargs)
+
+
+class ReplayFilter(smoothing.EmotionFilter):
+    """EmotionFilter that records the emotions it triggers."""
+
+    session: ReplaySession = None
+
+    def __init__(self, *args, **kwargs):
+        kwargs["clock"] = lambda: self.session.sim_time   # cooldowns in simulation time
+        super().__init__(*args, **kwargs)
+
+    def update(self, probs):
+        label = super().update(probs)
+        if label is not None:
+            self.session.log("trigger", label)
+        return label
+
+
+class ReplayScheduler(behavior.BehaviorScheduler):
+    """BehaviorScheduler that records the behaviors it starts."""
+
+    session: ReplaySession = None
+
+    def start(self, new: behavior.Behavior) -> bool:
+        started = super().start(new)
+        if started:
+            self.session.log("behavior", new.name)
+        return started
+
+
+class ReplaySequencer(motion.MotionSequencer):
+    """MotionSequencer that records the gestures it starts."""
+
+    session: ReplaySession = None
+
+    def play(self, gesture):
+        self.session.log("gesture", gesture.name)
+        super().play(gesture)
+
+
+class ReplaySpeech:
+    """SpeechService stand-in: records lines and finishes them instantly."""
+
+    session: ReplaySession = None
+
+    def __init__(self, *args, **kwargs):
+        self.busy = False
+
+    def start(self):
+        pass
+
+    def stop(self, timeout: float = 2.0):
+        pass
+
+    def say(self, text: str):
+        self.session.log("say", text)
+
+    def clear(self):
+        pass
+
+    def prerender(self, lines):
+        pass
+
+
+# ─── Robot ───────────────────────────────────────────────────────────────────
+
+class ReplayPreview(HeadlessPreview):
+    """No preview window, and no headless notice either."""
+
+    def start(self):
+        pass
+
+
+class StubDevice:
+    """Motor/LED stand-in; every method call is recorded as a command."""
+
+    def __init__(self, name: str, session: ReplaySession):
+        self.name = name
+        self._session = session
+
+    def __getattr__(self, method: str):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def record(*args):
+            self._session.command(self.name, method, args)
+        return record
+
+
+class StubRobot:
+    """controller.Robot stand-in; step() returns -1 once the recording has ended."""
+
+    session: ReplaySession = None
+    grabber: Optional[ReplayGrabber] = None
+
+    def __init__(self):
+        self._devices: Dict[str, StubDevice] = {}
+        self._time_ms = 0
+
+    def step(self, time_step: int) -> int:
+        if StubRobot.grabber is not None and StubRobot.grabber.exhausted:
+            return -1
+        self._time_ms += time_step
+        self.session.sim_time = self._time_ms / 1000.0
+        return 0
+
+    def getTime(self) -> float:
+        return self._time_ms / 1000.0
+
+    def getDevice(self, name: str) -> StubDevice:
+        if name not in self._devices:
+            self._devices[name] = StubDevice(name, self.session)
+        return self._devices[name]
+
+
+def _make_grabber(cap, width, height, slots=3):
+    grabber = ReplayGrabber(cap, width, height, slots)
+    StubRobot.grabber = grabber
+    return grabber
+
+
+def _make_pool(backend_name, workers, frame_shape, policy="largest", gate=None, cache=None):
+    print(f"[REPLAY] Running inference in-process instead of {workers} worker processes.")
+    return ReplayWorker(backends.make_backend(backend_name), policy=policy, gate=gate, cache=cache)
+
+
+def run(script: str, source: str, keep_commands: bool = False) -> ReplaySession:
+    """Run controller script against source (video file or image directory)."""
+    session = ReplaySession(keep_commands=keep_commands)
+    for cls in (ReplayGrabber, ReplayWorker, ReplayCache, ReplayFilter, ReplayScheduler, ReplaySequencer, ReplaySpeech,
+                StubRobot):
+        cls.session = session
+    StubRobot.grabber = None
+
+    stub = types.ModuleType("controller")
+    stub.Robot, stub.Motor, stub.LED = StubRobot, StubDevice, StubDevice
+    patches = [
+        (sys.modules, "controller", stub),
+        (pipeline, "FrameGrabber", _make_grabber),
+        (pipeline, "EmotionWorker", ReplayWorker),
+        (pipeline, "InferencePool", _make_pool),
+        (pipeline, "EmotionCache", ReplayCache),
+        (core, "EmotionFilter", ReplayFilter),
+        (core, "BehaviorScheduler", ReplayScheduler),
+        (core, "MotionSequencer", ReplaySequencer),
+        (core, "SpeechService", ReplaySpeech),
+        (cv2, "VideoCapture", lambda index, *args: ReplayCapture(source)),
+        (core, "PreviewRenderer", lambda *args, **kwargs: ReplayPreview()),
+    ]
+    saved = []
+    for target, name, value in patches:
+        if isinstance(target, dict):
+            saved.append((target, name, target.get(name)))
+            target[name] = value
+        else:
+            saved.append((target, name, getattr(target, name, None)))
+            setattr(target, name, value)
+
+    print(f"[REPLAY] Running {script} on {source}")
+    start = time.perf_counter()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code:
+            print(f"[WARN] Controller exited with status {e.code}.")
+    finally:
+        session.wall_time = time.perf_counter() - start
+        for target, name, value in reversed(saved):
+            if isinstance(target, dict):
+                if value is None:
+                    target.pop(name, None)
+                else:
+                    target[name] = value
+            else:
+                setattr(target, name, value)
+    return session
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay a recording through a Lumo controller, headless.")
+    parser.add_argument("controller", help="controller script, e.g. controllers/lumo_minimal/lumo_minimal.py")
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--timeline", help="write the timeline as JSONL to this path")
+    parser.add_argument("--commands", action="store_true", help="include every motor/LED command in the timeline")
+    args = parser.parse_args(argv)
+
+    session = run(args.controller, args.source, keep_commands=args.commands)
+    session.report()
+    if args.timeline:
+        session.dump(args.timeline)
+        print(f"[REPLAY] Timeline written to {args.timeline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# lumo/smoothing.py
+#
+# Temporal filtering of per-class emotion probabilities. A single noisy frame
+# should not fire a multi-second gesture and a spoken line, so reactions are
+# driven by a smoothed probability vector, a hysteresis state machine and a
+# per-emotion cooldown instead of by each frame's dominant_emotion.
+
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from lumo.events import log
+
+
+class EmotionFilter:
+    """
+    Streaming filter over probability vectors (one value per label, 0..1).
+
+    The last `window` vectors live in a fixed (window, n_labels) NumPy ring,
+    zero-initialised, and are averaged (soft vote), so one confident frame
+    alone cannot reach the threshold; pass alpha to use an exponential moving
+    average instead. An emotion becomes the current state once its smoothed
+    probability is the highest and reaches `enter`; it is left again when it
+    falls below `exit`. update() returns the label only on entering a state,
+    and at most once per `cooldown` seconds for the same label.
+    """
+
+    def __init__(self, labels: Sequence[str], window: int = 5, alpha: Optional[float] = None,
+                 enter: float = 0.55, exit: float = 0.35, cooldown: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if exit > enter:
+            raise ValueError("exit threshold must not exceed enter threshold")
+        self.labels = tuple(labels)
+        self.alpha = alpha
+        self.enter = enter
+        self.exit = exit
+        self.cooldown = cooldown
+        self.clock = clock
+        self._ring = np.zeros((window, len(self.labels)), dtype=np.float32)
+        self._next = 0
+        self.smoothed = np.zeros(len(self.labels), dtype=np.float32)
+        self.current: Optional[str] = None
+        self._last_fired: Dict[str, float] = {}
+
+    def reset(self):
+        """Drop all history and leave the current state."""
+        self._ring[:] = 0.0
+        self._next = 0
+        self.smoothed[:] = 0.0
+        self.current = None
+
+    def update(self, probs: Optional[np.ndarray]) -> Optional[str]:
+        """
+        Feed one probability vector (None when no face was seen).
+        Returns the label to react to, or None.
+        """
+        vec = self._ring[self._next]
+        if probs is None:
+            vec[:] = 0.0
+        else:
+            vec[:] = probs
+        self._next = (self._next + 1) % len(self._ring)
+
+        if self.alpha is None:
+            np.mean(self._ring, axis=0, out=self.smoothed)
+        else:
+            self.smoothed *= 1.0 - self.alpha
+            self.smoothed += self.alpha * vec
+
+        if self.current is not None:
+            if self.smoothed[self.labels.index(self.current)] < self.exit:
+                log.info("FILTER", f"Leaving '{self.current}'.")
+                self.current = None
+
+        best = int(np.argmax(self.smoothed))
+        label = self.labels[best]
+        if self.smoothed[best] < self.enter or label == self.current:
+            return None
+
+        self.current = label
+        now = self.clock()
+        last = self._last_fired.get(label)
+        if last is not None and now - last < self.cooldown:
+            log.info("FILTER", f"Entered '{label}' but still cooling down "
+                               f"({self.cooldown - (now - last):.1f}s left).")
+            return None
+        self._last_fired[label] = now
+        log.info("FILTER", f"Entered '{label}' (p={self.smoothed[best]:.2f}).")
+        return label
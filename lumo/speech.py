@@ -0,0 +1,157 @@
+# lumo/speech.py
+#
+# Text-to-speech on its own thread. say() queues a line and returns at once,
+# so robot.step, motion and perception keep running while Lumo talks.
+# Optionally every line is rendered to a WAV file once (cached on disk, keyed
+# by text + voice settings) and later played back instead of re-synthesized.
+
+import hashlib
+import itertools
+import os
+import queue
+import threading
+from typing import Iterable, Optional
+
+from lumo.events import log
+
+# Optional WAV players for cached lines; without one, lines are synthesized live.
+try:
+    import simpleaudio
+except ImportError:
+    simpleaudio = None
+try:
+    import winsound
+except ImportError:
+    winsound = None
+
+_STOP, _SAY, _RENDER = -1, 0, 1   # queue priorities: speaking beats pre-rendering
+
+
+class SpeechService:
+    """
+    Queue-backed pyttsx3 speaker.
+
+    The pyttsx3 engine is created on, and only used from, the service thread.
+    With cache_dir set, prerender() renders the given lines to WAV in the
+    background (live speech always goes first) and say() plays a cached file
+    when one exists.
+    """
+
+    def __init__(self, rate: int = 150, voice: Optional[str] = None, cache_dir: Optional[str] = None):
+        self.rate = rate
+        self.voice = voice
+        self.cache_dir = cache_dir
+        if cache_dir and simpleaudio is None and winsound is None:
+            print("[WARN] No WAV player (simpleaudio/winsound) available; TTS cache disabled.")
+            self.cache_dir = None
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._thread = None
+
+    @property
+    def busy(self) -> bool:
+        """True while any queued line has not finished playing."""
+        with self._lock:
+            return self._pending > 0
+
+    def start(self):
+        """Start the speech thread."""
+        self._thread = threading.Thread(target=self._run, name="SpeechService", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stop after the line currently playing (queued lines are dropped)."""
+        self._queue.put((_STOP, next(self._order), None))
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def say(self, text: str):
+        """Queue text for playback; never blocks."""
+        with self._lock:
+            self._pending += 1
+        self._queue.put((_SAY, next(self._order), text))
+
+    def clear(self):
+        """Drop queued lines that have not started yet (pre-render jobs are kept)."""
+        kept, dropped = [], 0
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job[0] == _SAY:
+                dropped += 1
+            else:
+                kept.append(job)
+        for job in kept:
+            self._queue.put(job)
+        with self._lock:
+            self._pending -= dropped
+
+    def prerender(self, lines: Iterable[str]):
+        """Render every line missing from the cache, in the background."""
+        if not self.cache_dir:
+            return
+        for text in dict.fromkeys(lines):
+            if not os.path.exists(self.cache_path(text)):
+                self._queue.put((_RENDER, next(self._order), text))
+
+    def cache_path(self, text: str) -> str:
+        """WAV file for text under the current voice settings."""
+        key = hashlib.sha1(f"{self.voice}|{self.rate}|{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".wav")
+
+    def _run(self):
+        import pyttsx3   # imported here so headless tools can load this module without it
+        engine = pyttsx3.init()
+        engine.setProperty("rate", self.rate)  # words per minute
+        if self.voice:
+            engine.setProperty("voice", self.voice)
+        print("[INFO] pyttsx3 TTS engine initialized.")
+        while True:
+            priority, _, text = self._queue.get()
+            if priority == _STOP:
+                return
+            try:
+                if priority == _RENDER:
+                    self._render(engine, text)
+                else:
+                    self._speak(engine, text)
+            except Exception as e:
+                log.warn("WARN", f"TTS error for '{text}': {e}")
+            finally:
+                if priority == _SAY:
+                    with self._lock:
+                        self._pending -= 1
+
+    def _speak(self, engine, text: str):
+        if self.cache_dir:
+            path = self.cache_path(text)
+            if os.path.exists(path):
+                try:
+                    self._play(path)
+                    return
+                except Exception as e:
+                    log.warn("WARN", f"Cached TTS playback failed ({e}); speaking live.")
+        engine.say(text)
+        engine.runAndWait()
+
+    def _render(self, engine, text: str):
+        path = self.cache_path(text)
+        if os.path.exists(path):
+            return
+        # Per process: robots sharing a cache folder may render the same line at once
+        tmp = f"{path[:-len('.wav')]}.{os.getpid()}.part.wav"
+        engine.save_to_file(text, tmp)
+        engine.runAndWait()
+        os.replace(tmp, path)
+
+    def _play(self, path: str):
+        if simpleaudio is not None:
+            simpleaudio.WaveObject.from_wave_file(path).play().wait_done()
+        else:
+            winsound.PlaySound(path, winsound.SND_FILENAME)
@@ -0,0 +1,44 @@
+# lumo/startup.py
+#
+# Startup-time breakdown for the controllers, so a slow start can be pinned on
+# the webcam, the robot, or the emotion model instead of guessed at.
+
+import threading
+import time
+from typing import List, Tuple
+
+
+class StartupTimer:
+    """
+    Collects named startup stages.
+
+    mark(name) closes a foreground stage that started at the previous mark;
+    add(name, seconds, background=True) records work timed elsewhere, e.g. on
+    a loader thread. report() prints everything plus the total wall time.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self._last = self.t0
+        self._lock = threading.Lock()
+        self.stages: List[Tuple[str, float, bool]] = []   # (name, seconds, background)
+
+    def mark(self, name: str) -> float:
+        """Record the time since the previous mark as stage name."""
+        now = time.perf_counter()
+        seconds = now - self._last
+        self._last = now
+        self.add(name, seconds)
+        return seconds
+
+    def add(self, name: str, seconds: float, background: bool = False):
+        with self._lock:
+            self.stages.append((name, seconds, background))
+
+    def report(self):
+        total = time.perf_counter() - self.t0
+        print(f"[INFO] Startup finished in {total:.2f}s:")
+        with self._lock:
+            stages = list(self.stages)
+        for name, seconds, background in stages:
+            print(f"[INFO]   {name:<28} {seconds:6.2f}s{'  (background)' if background else ''}")
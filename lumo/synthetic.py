@@ -0,0 +1,238 @@
+# lumo/synthetic.py
+#
+# Synthetic emotion driver: exercise the reactions and the gesture library
+# without a webcam, a model or a person acting in front of the camera. An
+# emotion script (a file of "time emotion" lines, or a seeded random stream)
+# is played in simulation time straight into dispatch. Every scripted emotion
+# triggers its reaction at once, with no smoothing window and no cooldown,
+# and speech is logged instead of spoken, so nothing waits on wall time.
+#
+# In Webots, start a controller with SYNTHETIC (or controllerArgs
+# "--synthetic=random:2000") and run the world with
+#
+#   webots --mode=fast --no-rendering --stdout worlds/ain457_synthetic.wbt
+#
+# Without Webots, the same run goes against the replay stub robot, as fast as
+# Python allows:
+#
+#   python -m lumo.synthetic controllers/lumo_expressive/lumo_expressive.py random:2000 --record sessions/
+#
+# The loop ends once the script has played out. Joint trajectories are the
+# session recorder's command stream (RECORD_DIR / --record), and per-behavior
+# timing goes to the event log (EVENT_LOG) and to the [SYNTH] summary.
+
+import argparse
+import random
+import runpy
+import sys
+import time
+import types
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lumo.backends import EMOTION_LABELS
+from lumo.inference import EmotionResult, FaceResult
+
+# Model labels the controllers react to (see lumo.core.REACTIONS)
+SCRIPT_EMOTIONS = ("happy", "sad", "angry", "fear", "surprise")
+
+Script = List[Tuple[float, str]]   # (simulation time [s], model label), sorted by time
+
+
+def random_script(count: int, seed: int = 0, gap: Tuple[float, float] = (0.5, 5.0),
+                  emotions: Sequence[str] = SCRIPT_EMOTIONS) -> Script:
+    """count emotions at random gaps (uniform in gap, seconds); some interrupt the previous reaction."""
+    rng = random.Random(seed)
+    t, script = 0.0, []
+    for _ in range(count):
+        t += rng.uniform(*gap)
+        script.append((round(t, 3), rng.choice(emotions)))
+    return script
+
+
+def load_script(path: str) -> Script:
+    """A script file: one "time emotion" pair per line (time in simulation seconds), # comments."""
+    script = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            t, label = line.replace(",", " ").split()
+            if label not in EMOTION_LABELS:
+                raise ValueError(f"{path}:{number}: unknown emotion '{label}' "
+                                 f"(choose from {', '.join(EMOTION_LABELS)})")
+            script.append((float(t), label))
+    return sorted(script)
+
+
+def parse_script(spec: str) -> Script:
+    """"random", "random:COUNT" or "random:COUNT:SEED" (default 100 emotions, seed 0), else a script file."""
+    if spec == "random" or spec.startswith("random:"):
+        parts = spec.split(":")[1:]
+        count = int(parts[0]) if parts and parts[0] else 100
+        seed = int(parts[1]) if len(parts) > 1 else 0
+        return random_script(count, seed)
+    return load_script(spec)
+
+
+class SyntheticDriver:
+    """
+    EmotionWorker stand-in that plays a Script in simulation time.
+
+    poll() returns a single-face EmotionResult for the next due emotion
+    (one-hot probabilities), else None. clock() is the simulation time.
+    behavior_done() collects per-reaction timings for report().
+    """
+
+    cache = None
+
+    def __init__(self, script: Script, clock):
+        self.script = script
+        self.clock = clock
+        self.played = 0
+        self.interrupted = 0
+        self.durations: Dict[str, List[float]] = {}
+        self._result: Optional[EmotionResult] = None
+        self._t0 = None
+        self._wall = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self.played >= len(self.script)
+
+    def start(self):
+        print(f"[INFO] Synthetic emotion driver: {len(self.script)} emotions over "
+              f"{self.script[-1][0] if self.script else 0.0:.1f}s simulated.")
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        pass
+
+    def stop(self, timeout: float = 2.0):
+        pass
+
+    def submit(self, frame) -> Optional[int]:
+        return None
+
+    def poll(self) -> Optional[EmotionResult]:
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+        if self.done or self.script[self.played][0] > self.clock():
+            return None
+        label = self.script[self.played][1]
+        self.played += 1
+        if self.done:
+            self._wall = time.perf_counter() - self._t0
+        probs = np.zeros(len(EMOTION_LABELS), np.float32)
+        probs[EMOTION_LABELS.index(label)] = 1.0
+        self._result = EmotionResult(
+            seq=self.played, dominant_emotion=label, probs=probs, face_box=(0, 0, 1, 1), target=0,
+            emotions={name: float(p) * 100.0 for name, p in zip(EMOTION_LABELS, probs)},
+            timestamp=time.monotonic(), faces=[FaceResult((0, 0, 1, 1), probs, label)])
+        return self._result
+
+    def latest(self) -> Optional[EmotionResult]:
+        return self._result
+
+    def behavior_done(self, name: str, seconds: float, interrupted: bool):
+        self.durations.setdefault(name, []).append(seconds)
+        self.interrupted += interrupted
+
+    def report(self):
+        wall = self._wall or (time.perf_counter() - self._t0 if self._t0 is not None else 0.0)
+        finished = sum(len(d) for d in self.durations.values())
+        rate = 60.0 * finished / wall if wall > 0 else 0.0
+        print(f"[SYNTH] {self.played} emotions played, {finished} behaviors ({self.interrupted} interrupted) "
+              f"in {self.clock():.1f}s simulated / {wall:.1f}s wall = {rate:.0f} reactions/min.")
+        print(f"[SYNTH]   {'behavior':<11} {'n':>5} {'p50':>7} {'p95':>7} {'max':>7}  [s simulated]")
+        for name, durations in sorted(self.durations.items()):
+            d = np.asarray(durations)
+            print(f"[SYNTH]   {name:<11} {len(d):5d} {np.percentile(d, 50):7.2f} {np.percentile(d, 95):7.2f} "
+                  f"{d.max():7.2f}")
+
+
+class PassThroughFilter:
+    """EmotionFilter stand-in: every result's dominant emotion triggers at once (no window, no cooldown)."""
+
+    def __init__(self, labels: Sequence[str] = EMOTION_LABELS):
+        self.labels = tuple(labels)
+        self.current: Optional[str] = None
+
+    def update(self, probs) -> Optional[str]:
+        self.current = None if probs is None else self.labels[int(np.argmax(probs))]
+        return self.current
+
+
+class SilentSpeech:
+    """SpeechService stand-in: lines are only logged (by Lumo.speak) and finish at once."""
+
+    busy = False
+
+    def start(self):
+        pass
+
+    def stop(self, timeout: float = 2.0):
+        pass
+
+    def say(self, text: str):
+        pass
+
+    def clear(self):
+        pass
+
+    def prerender(self, lines):
+        pass
+
+
+def run(script: str, spec: str, record: Optional[str] = None, log_path: Optional[str] = None):
+    """Run controller script with the synthetic driver spec against the replay stub robot."""
+    from lumo import core, replay
+
+    session = replay.ReplaySession()
+    replay.StubRobot.session = session
+    replay.StubRobot.grabber = None
+    stub = types.ModuleType("controller")
+    stub.Robot, stub.Motor, stub.LED = replay.StubRobot, replay.StubDevice, replay.StubDevice
+    start = core.Lumo.start
+
+    def start_synthetic(lumo):
+        lumo.config.synthetic = spec
+        lumo.config.headless = True
+        if record:
+            lumo.config.record_dir = record
+        if log_path:
+            lumo.config.event_log = log_path
+            lumo.config.log_level = "WARN"   # the file gets everything; keep the console quiet
+        start(lumo)
+
+    saved = sys.modules.get("controller"), sys.argv
+    sys.modules["controller"] = stub
+    sys.argv = [script]
+    core.Lumo.start = start_synthetic
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        core.Lumo.start = start
+        sys.argv = saved[1]
+        if saved[0] is None:
+            sys.modules.pop("controller", None)
+        else:
+            sys.modules["controller"] = saved[0]
+    print(f"[SYNTH] {session.commands} device commands sent.")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Drive a Lumo controller with a synthetic emotion stream, "
+                                                 "without Webots, a webcam or a model.")
+    parser.add_argument("controller", help="controller script, e.g. controllers/lumo_expressive/lumo_expressive.py")
+    parser.add_argument("script", nargs="?", default="random:100",
+                        help='"random[:COUNT[:SEED]]" or a file of "time emotion" lines (default random:100)')
+    parser.add_argument("--record", help="record the session (joint trajectories, ...) under this directory")
+    parser.add_argument("--log", help="write the event log (incl. per-behavior timing) as JSONL to this path")
+    args = parser.parse_args(argv)
+    run(args.controller, args.script, record=args.record, log_path=args.log)
+
+
+if __name__ == "__main__":
+    main()